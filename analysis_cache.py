@@ -0,0 +1,117 @@
+import collections
+import json
+import sqlite3
+import threading
+import chess
+import chess.polyglot
+
+# On-disk store shared across sessions and the number of entries kept in memory
+cache_path = 'analysis_cache.sqlite3'
+memory_entries = 4096
+
+
+def position_key(board):
+    """Return the Zobrist hash of the position as a signed 64-bit integer (SQLite's INTEGER range)."""
+    key = chess.polyglot.zobrist_hash(board)
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class Analysis:
+    """Engine result for one position: search depth and its principal lines, best first."""
+    def __init__(self, depth, lines):
+        self.depth = depth
+        self.lines = lines  # [(move in UCI, centipawns or None, mate in N or None)] for the side to move
+
+    @property
+    def best_move(self):
+        return self.lines[0][0] if self.lines else None
+
+    @classmethod
+    def from_infos(cls, infos):
+        """Build an Analysis from python-chess info dicts (one per multipv line)."""
+        lines = []
+        for info in infos:
+            if not info.get('pv'):
+                continue
+            score = info.get('score')
+            score = score.relative if score is not None else None
+            lines.append((info['pv'][0].uci(),
+                          score.score() if score is not None else None,
+                          score.mate() if score is not None else None))
+        depth = min((info.get('depth', 0) for info in infos), default=0)
+        return cls(depth, lines)
+
+    def __repr__(self):
+        return f"Analysis(depth={self.depth}, lines={self.lines})"
+
+
+class AnalysisCache:
+    """LRU of engine analyses in memory, backed by SQLite so results survive restarts.
+
+    Entries are keyed by position hash and multipv; a deeper analysis replaces a
+    shallower one, and a lookup is satisfied by any analysis at least as deep.
+    """
+    def __init__(self, path=cache_path, capacity=memory_entries):
+        self.capacity = capacity
+        self.memory = collections.OrderedDict()  # (position key, multipv) -> Analysis
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS analysis (
+            position INTEGER NOT NULL,
+            multipv INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            lines TEXT NOT NULL,
+            PRIMARY KEY (position, multipv))''')
+        self.db.commit()
+
+    def get(self, board, depth, multipv=1):
+        """Return a cached Analysis of the position at least `depth` deep, or None."""
+        key = (position_key(board), multipv)
+        with self.lock:
+            analysis = self.memory.get(key)
+            if analysis is None:
+                row = self.db.execute('SELECT depth, lines FROM analysis WHERE position = ? AND multipv = ?', key).fetchone()
+                if row is not None:
+                    analysis = Analysis(row[0], [tuple(line) for line in json.loads(row[1])])
+                    self.remember(key, analysis)
+            else:
+                self.memory.move_to_end(key)
+
+            if analysis is None or analysis.depth < depth:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return analysis
+
+    def put(self, board, analysis, multipv=1):
+        """Store an analysis unless an equally deep or deeper one is already cached."""
+        if not analysis.lines:
+            return
+        key = (position_key(board), multipv)
+        with self.lock:
+            cached = self.memory.get(key)
+            if cached is None:
+                row = self.db.execute('SELECT depth FROM analysis WHERE position = ? AND multipv = ?', key).fetchone()
+                cached_depth = row[0] if row is not None else -1
+            else:
+                cached_depth = cached.depth
+            if cached_depth >= analysis.depth:
+                return
+            self.remember(key, analysis)
+            self.db.execute('''INSERT INTO analysis (position, multipv, depth, lines) VALUES (?, ?, ?, ?)
+                ON CONFLICT (position, multipv) DO UPDATE SET depth = excluded.depth, lines = excluded.lines
+                WHERE excluded.depth > analysis.depth''', key + (analysis.depth, json.dumps(analysis.lines)))
+            self.db.commit()
+
+    def remember(self, key, analysis):
+        # Called with the lock held
+        self.memory[key] = analysis
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.capacity:
+            self.memory.popitem(last=False)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,154 @@
+import argparse
+import collections
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import cv2
+from board_locator import BoardLocator
+from capture_sources import ReplaySource
+from readchess import BoardRecognizer, canonical_square_size, template_scales, batch_square_size, orb_settings
+from template_bundle import open_bundle
+
+# File extensions read as still images; anything else is opened as a video
+image_extensions = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+# Tasks in flight per worker process; bounds the decoded frames held in memory
+tasks_per_worker = 4
+
+# Per-process state, set up once by init_worker so templates are loaded once per worker
+worker_recognizer = None
+worker_locator = None
+
+
+def init_worker(batch, locate, theme):
+    global worker_recognizer, worker_locator
+    # Workers already run in parallel; keep OpenCV from oversubscribing the cores
+    cv2.setNumThreads(1)
+    # A compiled theme is memory-mapped and shared by every worker through the page cache
+    worker_recognizer = BoardRecognizer(batch=batch, bundle=open_bundle(theme) if theme else None)
+    worker_locator = BoardLocator() if locate else None
+
+
+def recognize_task(task):
+    """Recognize one (source, frame index, timestamp, path or frame) task and return its JSONL record."""
+    source, index, timestamp, image = task
+    record = {'source': source, 'frame': index, 'time': timestamp}
+    start = time.perf_counter()
+    try:
+        if isinstance(image, str):
+            image = cv2.imread(image)
+            if image is None:
+                record['error'] = 'could not read image'
+                return record
+
+        if worker_locator is not None:
+            geometry = worker_locator.locate(image)
+            if geometry is None:
+                record['error'] = 'no board found'
+                return record
+            record['board'] = list(geometry.roi)
+            image = geometry.crop(image)
+
+        result = worker_recognizer.recognize(image)
+    except Exception as e:
+        # One bad input (too small, corrupt frame) must not end the whole run
+        record['error'] = str(e) or type(e).__name__
+        return record
+    record['fen'] = result.fen
+    record['min_confidence'] = round(min(result.confidences.values()), 3)
+    record['ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return record
+
+
+def expand_inputs(patterns):
+    """Yield every file matched by the glob patterns, in order and without duplicates."""
+    seen = set()
+    for pattern in patterns:
+        paths = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in paths:
+            if path not in seen and os.path.isfile(path):
+                seen.add(path)
+                yield path
+
+
+def generate_tasks(paths, every, sample_fps):
+    """Yield recognition tasks: image paths as they are, videos decoded into sampled frames."""
+    for path in paths:
+        if path.lower().endswith(image_extensions):
+            yield path, None, None, path
+            continue
+
+        try:
+            source = ReplaySource(path)
+        except ValueError as e:
+            print(f"Skipping {path}: {e}", file=sys.stderr)
+            continue
+        with source:
+            # Keep every n-th frame; --sample-fps turns a rate into that n
+            step = every
+            if sample_fps and source.fps:
+                step = max(1, round(source.fps / sample_fps))
+            for index, frame in enumerate(source):
+                if index % step == 0:
+                    yield path, index, round(source.frame_offset(index), 3), frame
+
+
+def run(tasks, processes, batch, locate, output, theme=None):
+    """Recognize tasks on a process pool, writing records in input order; returns the record count."""
+    max_pending = processes * tasks_per_worker
+    count = 0
+    with multiprocessing.Pool(processes, initializer=init_worker, initargs=(batch, locate, theme)) as pool:
+        pending = collections.deque()
+        for task in tasks:
+            pending.append(pool.apply_async(recognize_task, (task,)))
+            # Wait for the oldest task before decoding more frames
+            if len(pending) >= max_pending:
+                output.write(json.dumps(pending.popleft().get()) + '\n')
+                count += 1
+        while pending:
+            output.write(json.dumps(pending.popleft().get()) + '\n')
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recognize board positions in screenshots or videos and print FENs as JSONL.")
+    parser.add_argument('inputs', nargs='+', help="image files, videos, or glob patterns (quote them)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--every', type=int, default=1, help="recognize every n-th video frame")
+    parser.add_argument('--sample-fps', type=float, help="recognize video frames at this rate instead of --every")
+    parser.add_argument('--orb', action='store_true', help="use ORB matching instead of the batch classifier")
+    parser.add_argument('--locate', action='store_true', help="find the board inside each frame instead of assuming a cropped board")
+    parser.add_argument('--theme', help="compiled template theme (see template_bundle.py) instead of the template folders")
+    parser.add_argument('--output', help="write JSONL here instead of stdout")
+    args = parser.parse_args(argv)
+
+    # Open the theme here: a worker initializer that raises makes the pool respawn workers forever
+    theme = None
+    if args.theme:
+        try:
+            bundle = open_bundle(args.theme)
+            bundle.check(canonical_square_size, template_scales, batch_square_size, orb_settings)
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot use theme {args.theme}: {e}")
+        if bundle.stale():
+            print(f"Warning: {bundle.path} is older than its templates; rebuild it with template_bundle.py build", file=sys.stderr)
+        theme = bundle.path
+
+    tasks = generate_tasks(expand_inputs(args.inputs), max(1, args.every), args.sample_fps)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        count = run(tasks, max(1, args.workers), not args.orb, args.locate, output, theme)
+    finally:
+        if args.output:
+            output.close()
+    elapsed = time.perf_counter() - start
+    print(f"{count} positions in {elapsed:.2f}s ({count / elapsed:.1f}/s) on {args.workers} workers", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
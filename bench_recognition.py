@@ -0,0 +1,126 @@
+import argparse
+import json
+import sys
+import time
+import cv2
+import numpy as np
+from metrics import metrics
+from readchess import BoardRecognizer, piece_symbol, piece_template_files
+
+# Stages timed by BoardRecognizer.recognize, in pipeline order
+stages = ['normalize', 'prefix', 'classification', 'fen']
+
+
+def load_piece_images():
+    """Load every piece template in color, keyed like readchess templates ("white_rook_dark")."""
+    return {name: cv2.imread(path) for name, path in piece_template_files()}
+
+
+def square_colors(images):
+    """Estimate the light and dark square colors from the background corners of the piece images."""
+    colors = {'light': [], 'dark': []}
+    for name, image in images.items():
+        # Skip the outer pixel row/column, some templates carry a border there
+        corner = image[2:8, 2:8].reshape(-1, 3)
+        colors[name.rsplit('_', 1)[1]].append(np.median(corner, axis=0))
+    return {shade: np.median(values, axis=0).astype(np.uint8) for shade, values in colors.items()}
+
+
+def synthesize_board(images, colors, size, density, rng):
+    """Return (board image, 64 FEN symbols with '' for empty) for a random board of size x size pixels."""
+    square = size // 8
+    board = np.empty((8 * square, 8 * square, 3), np.uint8)
+    symbols = []
+    by_shade = {shade: [name for name in images if name.endswith(shade)] for shade in colors}
+    for row in range(8):
+        for col in range(8):
+            # a8 (row 0, col 0) is a light square
+            shade = 'light' if (row + col) % 2 == 0 else 'dark'
+            tile = board[row * square:(row + 1) * square, col * square:(col + 1) * square]
+            if by_shade[shade] and rng.random() < density:
+                name = by_shade[shade][rng.integers(len(by_shade[shade]))]
+                tile[:] = cv2.resize(images[name], (square, square), interpolation=cv2.INTER_AREA)
+                symbols.append(piece_symbol(name))
+            else:
+                tile[:] = colors[shade]
+                symbols.append('')
+    return board, symbols
+
+
+def milliseconds(summary):
+    return {f'{key}_ms': summary[key] * 1000 for key in ('mean', 'p50', 'p90', 'p99', 'max')}
+
+
+def run(recognizer, boards):
+    """Time BoardRecognizer.recognize on each (image, symbols) board and score the results.
+
+    Stage timings come from the recognizer's own metrics timers, so the benchmark
+    always measures the real pipeline.
+    """
+    enabled, window = metrics.enabled, metrics.window
+    metrics.enabled = True
+    metrics.window = max(window, len(boards))  # Keep every sample for the percentiles
+    metrics.reset()
+    correct = 0
+    try:
+        for image, symbols in boards:
+            start = time.perf_counter()
+            result = recognizer.recognize(image)
+            metrics.observe('total', time.perf_counter() - start)
+            correct += sum((piece_symbol(p) if p else '') == s for p, s in zip(result.squares.values(), symbols))
+        snapshot = metrics.snapshot()
+    finally:
+        metrics.reset()
+        metrics.enabled, metrics.window = enabled, window
+
+    timers = snapshot['timers']
+    total = timers['total']['sum'] if boards else 0.0
+    return {
+        'boards': len(boards),
+        'boards_per_sec': len(boards) / total if total else 0.0,
+        'square_accuracy': correct / (64 * len(boards)) if boards else 0.0,
+        'stages': {stage: milliseconds(timers[stage]) for stage in stages + ['total'] if stage in timers},
+        'counters': snapshot['counters'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark board recognition on synthetic boards.")
+    parser.add_argument('--boards', type=int, default=100, help="number of synthetic boards per mode")
+    parser.add_argument('--size', type=int, default=800, help="board size in pixels")
+    parser.add_argument('--density', type=float, default=0.4, help="fraction of squares holding a piece")
+    parser.add_argument('--mode', choices=['orb', 'batch', 'both'], default='both')
+    parser.add_argument('--no-skip-empty', action='store_true', help="classify every square, even ones that look empty")
+    parser.add_argument('--warmup', type=int, default=3, help="untimed boards run first")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    images = load_piece_images()
+    colors = square_colors(images)
+    boards = [synthesize_board(images, colors, args.size, args.density, rng) for _ in range(args.boards)]
+
+    report = {'config': vars(args), 'results': {}}
+    modes = ['orb', 'batch'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        recognizer = BoardRecognizer(batch=(mode == 'batch'), skip_empty=not args.no_skip_empty)
+        run(recognizer, boards[:args.warmup])
+        report['results'][mode] = run(recognizer, boards)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    # Short human-readable summary on stderr so stdout stays machine-readable
+    for mode, result in report['results'].items():
+        print(f"{mode}: {result['boards_per_sec']:.1f} boards/s, "
+              f"p50 {result['stages']['total']['p50_ms']:.2f} ms, "
+              f"accuracy {result['square_accuracy']:.3f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+import cv2
+import numpy as np
+from metrics import metrics
+
+# Frames are downscaled to at most this width before searching for the board
+detect_width = 960
+
+# Smallest square (in downscaled pixels) considered part of a board
+min_square_size = 10
+
+# Square candidates must be within this relative tolerance of the board's square size
+size_tolerance = 0.15
+
+# Minimum gray level difference between light and dark squares, and the largest
+# spread (relative to that difference) allowed within the light or dark squares
+min_checker_contrast = 20
+max_checker_spread = 0.25
+
+# Squares allowed off their expected level before a cached grid counts as moved;
+# covers move highlights and coordinate labels
+max_mismatched_squares = 4
+
+# True for squares whose file + rank index is odd, in image order
+square_parity = (np.add.outer(np.arange(8), np.arange(8)) % 2).astype(bool)
+
+
+def corner_means(board):
+    """Return a (4, 8, 8) array with the gray level near each corner of every square."""
+    # Corners are where pieces almost never reach. Any shift of more than 1/8 of a
+    # square moves at least two of the four samples into an orthogonal neighbour,
+    # which has the other colour
+    square_height = board.shape[0] / 8
+    square_width = board.shape[1] / 8
+    index = np.arange(8)
+    means = []
+    for corner_y in (3 / 32, 29 / 32):
+        for corner_x in (3 / 32, 29 / 32):
+            # Average a 3x3 grid of pixels around the corner point of every square
+            ys = ((index[:, None] + corner_y + np.array([-1, 0, 1]) / 64) * square_height).astype(int).reshape(8, 1, 3, 1)
+            xs = ((index[:, None] + corner_x + np.array([-1, 0, 1]) / 64) * square_width).astype(int).reshape(1, 8, 1, 3)
+            samples = board[ys, xs].astype(np.float32)
+            if samples.ndim == 5:
+                samples = samples @ np.array([0.114, 0.587, 0.299], np.float32)  # BGR to gray
+            means.append(samples.mean(axis=(2, 3)))
+    return np.stack(means)
+
+
+def checker_levels(board):
+    """Return the gray levels of the (even, odd) squares, or None if the image does not look like a checkerboard."""
+    means = corner_means(board)
+    even, odd = means[:, ~square_parity], means[:, square_parity]
+
+    # Medians and median absolute deviations keep coordinate labels from skewing the result
+    even_level, odd_level = float(np.median(even)), float(np.median(odd))
+    contrast = abs(even_level - odd_level)
+    spread = max(np.median(np.abs(even - even_level)), np.median(np.abs(odd - odd_level)))
+    if contrast < min_checker_contrast or spread > max_checker_spread * contrast:
+        return None
+    return even_level, odd_level
+
+
+def mismatched_squares(board, levels):
+    """Count squares with two or more corners away from the level their colour had at detection."""
+    # Expected levels keep the parity, so a board shifted by an odd number of squares
+    # fails everywhere; squares uncovered outside the old board fail too
+    means = corner_means(board)
+    expected = np.where(square_parity, levels[1], levels[0])
+    off = np.abs(means - expected) > 0.5 * abs(levels[0] - levels[1])
+    return int((off.sum(axis=0) >= 2).sum())
+
+
+class BoardGeometry:
+    """Location of the board inside a frame, the size of its squares and their gray levels."""
+    def __init__(self, x, y, width, height, levels=None):
+        self.x = int(x)
+        self.y = int(y)
+        self.width = int(width)
+        self.height = int(height)
+        self.levels = levels  # (even, odd) square gray levels seen at detection
+
+    @property
+    def roi(self):
+        return (self.x, self.y, self.width, self.height)
+
+    @property
+    def square_width(self):
+        return self.width / 8
+
+    @property
+    def square_height(self):
+        return self.height / 8
+
+    def square(self, col, row):
+        """Return the (x, y, width, height) of a square in frame coordinates, row 0 is the top rank."""
+        x = self.x + round(col * self.square_width)
+        y = self.y + round(row * self.square_height)
+        return (x, y, round(self.square_width), round(self.square_height))
+
+    def crop(self, frame):
+        """Return a view of the board inside the frame."""
+        return frame[self.y:self.y + self.height, self.x:self.x + self.width]
+
+    def offset(self, left, top):
+        """Return the same geometry shifted by (left, top), e.g. into screen coordinates."""
+        return BoardGeometry(self.x + left, self.y + top, self.width, self.height, self.levels)
+
+    def __eq__(self, other):
+        return isinstance(other, BoardGeometry) and self.roi == other.roi
+
+    def __repr__(self):
+        return f"BoardGeometry{self.roi}"
+
+
+class BoardLocator:
+    """Find the board grid inside a full frame and keep it cached while it stays put."""
+    def __init__(self):
+        self.geometry = None  # Cached geometry from the last successful detection
+        self.detections = 0  # Number of full detections run so far
+
+    def locate(self, frame):
+        """Return the board geometry for a frame, re-detecting only when the cached grid no longer fits."""
+        with metrics.timer('localization'):
+            if self.geometry is not None and self.verify(frame, self.geometry):
+                return self.geometry
+            self.geometry = self.detect(frame)
+            return self.geometry
+
+    def verify(self, frame, geometry=None):
+        """Cheaply check that the geometry still frames the detected board.
+
+        Without a geometry the frame is taken to be a crop of the cached board's region.
+        """
+        reference = geometry if geometry is not None else self.geometry
+        if geometry is not None:
+            if geometry.x + geometry.width > frame.shape[1] or geometry.y + geometry.height > frame.shape[0]:
+                return False
+            frame = geometry.crop(frame)
+        if frame.shape[0] < 8 or frame.shape[1] < 8:
+            return False
+        if reference is None or reference.levels is None:
+            return checker_levels(frame) is not None
+        return mismatched_squares(frame, reference.levels) <= max_mismatched_squares
+
+    def detect(self, frame):
+        """Search the whole frame for an 8x8 board and return its BoardGeometry, or None."""
+        self.detections += 1
+        metrics.count('board_detections')
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+
+        # Work on a downscaled copy; square boundaries survive easily
+        scale = min(1.0, detect_width / gray.shape[1])
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+
+        # Flat regions between edges are square candidates; a piece leaves a ring whose
+        # bounding box is still the full square
+        edges = cv2.dilate(cv2.Canny(small, 30, 90), np.ones((3, 3), np.uint8))
+        _, _, stats, _ = cv2.connectedComponentsWithStats(255 - edges, connectivity=4)
+        widths = stats[1:, cv2.CC_STAT_WIDTH].astype(np.float32)
+        heights = stats[1:, cv2.CC_STAT_HEIGHT].astype(np.float32)
+        fill = stats[1:, cv2.CC_STAT_AREA] / np.maximum(widths * heights, 1)
+        candidates = (widths >= min_square_size) & (np.abs(widths - heights) <= size_tolerance * widths) & (fill >= 0.3)
+        if candidates.sum() < 8:
+            return None
+        sizes = widths[candidates]
+        boxes = stats[1:][candidates]
+
+        # The board's square size is the one shared by the most candidates
+        similar = np.abs(sizes[:, None] - sizes[None, :]) <= size_tolerance * sizes[:, None]
+        side = np.median(sizes[similar[similar.sum(axis=1).argmax()]])
+        members = np.abs(sizes - side) <= size_tolerance * side
+        boxes = boxes[members]
+        if len(boxes) < 8:
+            return None
+
+        # Grid pitch: squares are separated by the dilated edge, so use the component
+        # boxes' own extents to estimate the step between neighbouring squares
+        lefts = boxes[:, cv2.CC_STAT_LEFT].astype(np.float32)
+        tops = boxes[:, cv2.CC_STAT_TOP].astype(np.float32)
+        pitch = self.pitch(lefts, side) or self.pitch(tops, side)
+        if pitch is None:
+            return None
+
+        # Snap every candidate to a lattice anchored at the first one, refine pitch and
+        # anchor with a least squares fit, then pick the 8x8 window of lattice cells
+        # holding the most candidates
+        cols = np.round((lefts - lefts[0]) / pitch).astype(int)
+        rows = np.round((tops - tops[0]) / pitch).astype(int)
+        pitch, anchor_x, anchor_y = self.fit_lattice(lefts, tops, cols, rows)
+        best = None
+        for col0 in range(cols.min() - 7, cols.max() + 1):
+            in_cols = (cols >= col0) & (cols < col0 + 8)
+            if not in_cols.any():
+                continue
+            for row0 in range(rows.min() - 7, rows.max() + 1):
+                votes = int((in_cols & (rows >= row0) & (rows < row0 + 8)).sum())
+                if best is None or votes > best[0]:
+                    best = (votes, col0, row0)
+        _, col0, row0 = best
+
+        # Board edges sit half an edge width outside the component boxes
+        border = (pitch - side) / 2
+        x = (anchor_x + col0 * pitch - border) / scale
+        y = (anchor_y + row0 * pitch - border) / scale
+        size = 8 * pitch / scale
+        x, y = max(0, round(x)), max(0, round(y))
+        width = min(round(size), gray.shape[1] - x)
+        height = min(round(size), gray.shape[0] - y)
+
+        geometry = BoardGeometry(x, y, width, height)
+        geometry.levels = checker_levels(geometry.crop(frame)) if width >= 8 and height >= 8 else None
+        if geometry.levels is None or not self.verify(frame, geometry):
+            return None
+        return geometry
+
+    @staticmethod
+    def fit_lattice(lefts, tops, cols, rows):
+        """Fit lefts = anchor_x + cols * pitch and tops = anchor_y + rows * pitch with one shared pitch."""
+        n = len(lefts)
+        design = np.zeros((2 * n, 3), np.float32)
+        design[:n, 0], design[n:, 0] = cols, rows
+        design[:n, 1] = 1
+        design[n:, 2] = 1
+        (pitch, anchor_x, anchor_y), *_ = np.linalg.lstsq(design, np.concatenate([lefts, tops]), rcond=None)
+        return float(pitch), float(anchor_x), float(anchor_y)
+
+    @staticmethod
+    def pitch(starts, side):
+        """Estimate the distance between neighbouring squares from candidate start coordinates."""
+        steps = np.diff(np.unique(np.round(starts)))
+        steps = steps[(steps > 0.5 * side) & (steps < 1.6 * side)]
+        if len(steps) == 0:
+            return None
+        return float(np.median(steps))
@@ -0,0 +1,130 @@
+import time
+import chess
+from metrics import metrics
+from readchess import BoardRecognizer, IncrementalRecognizer
+
+# Boards whose position changed within this many seconds are scheduled ahead of quiet ones
+recent_change_window = 10.0
+recent_change_boost = 4.0
+
+# Recognition time spent per step before the remaining boards wait for the next one
+recognition_budget = 0.05
+
+
+class MonitoredBoard:
+    """One registered board region and what was last read from it."""
+    def __init__(self, name, rect, recognizer):
+        self.name = name
+        self.rect = rect  # Screen region (x, y, width, height)
+        self.recognizer = IncrementalRecognizer(recognizer)
+        self.result = None  # Last RecognitionResult
+        self.fen = None
+        self.key = None  # Zobrist key of the last position, compared instead of the FEN
+        self.changed_at = None  # When the FEN last changed (time.monotonic())
+        self.checked_at = None  # When the board was last recognized
+        self.analysed_fen = None  # Last FEN handed to the engine
+        self.best_move = None  # Engine's move for analysed_fen, in UCI notation
+
+    def priority(self, now):
+        """Return the scheduling priority: time waited, boosted for boards that changed recently."""
+        if self.checked_at is None:
+            return float('inf')
+        waited = now - self.checked_at
+        if self.changed_at is not None and now - self.changed_at < recent_change_window:
+            waited *= recent_change_boost
+        return waited
+
+
+class MultiBoardMonitor:
+    """Watch several board regions with one grab per monitor and one shared template bank.
+
+    All boards on a monitor are cropped from a single grab of their bounding box, and
+    every board's recognizer shares the templates and matchers of one BoardRecognizer.
+    Each step recognizes boards in priority order within a time budget, so recently
+    active boards are refreshed first and quiet ones still get their turn. One engine
+    is shared the same way: next_analysis() picks the board it should search next.
+    """
+    def __init__(self, capture, recognizer=None, budget=recognition_budget):
+        self.capture = capture  # ScreenCapture used for the grabs
+        self.recognizer = recognizer if recognizer is not None else BoardRecognizer(batch=True)
+        self.budget = budget
+        self.boards = {}  # Name -> MonitoredBoard
+
+    def add(self, name, rect):
+        board = MonitoredBoard(name, tuple(rect), self.recognizer.share())
+        self.boards[name] = board
+        return board
+
+    def remove(self, name):
+        self.boards.pop(name, None)
+
+    def grab(self):
+        """Capture every monitor holding a board once and return {name: board frame view}."""
+        groups = {}
+        for board in list(self.boards.values()):
+            monitor = self.capture.get_monitor_from_position(board.rect[0], board.rect[1])
+            groups.setdefault(monitor['id'], []).append(board)
+
+        frames = {}
+        for boards in groups.values():
+            # Grab the bounding box of the monitor's boards and crop each board out of it
+            left = min(board.rect[0] for board in boards)
+            top = min(board.rect[1] for board in boards)
+            right = max(board.rect[0] + board.rect[2] for board in boards)
+            bottom = max(board.rect[1] + board.rect[3] for board in boards)
+            image = self.capture.capture_screen((left, top, right - left, bottom - top))
+            if image is None:
+                continue
+            for board in boards:
+                x, y, width, height = board.rect
+                frames[board.name] = image[y - top:y - top + height, x - left:x - left + width]
+        metrics.count('monitor_grabs', len(groups))
+        return frames
+
+    def schedule(self, now=None):
+        """Return the boards in the order they should be recognized."""
+        now = time.monotonic() if now is None else now
+        return sorted(self.boards.values(), key=lambda board: board.priority(now), reverse=True)
+
+    def process(self, frames):
+        """Recognize boards from grabbed frames in priority order; returns the boards whose FEN changed."""
+        start = time.monotonic()
+        changed = []
+        recognized = 0
+        for board in self.schedule(start):
+            frame = frames.get(board.name)
+            if frame is None or frame.size == 0:
+                continue
+            # Past the budget only new boards are read; at least one board is read every
+            # step, and waiting raises a board's priority, so none starves
+            if recognized and board.checked_at is not None and time.monotonic() - start > self.budget:
+                metrics.count('monitor_boards_deferred')
+                continue
+            recognized += 1
+
+            board.result = board.recognizer.recognize(frame)
+            board.checked_at = time.monotonic()
+            if board.result.key != board.key:
+                board.key = board.result.key
+                board.fen = board.result.fen
+                board.changed_at = board.checked_at
+                changed.append(board)
+        return changed
+
+    def step(self):
+        return self.process(self.grab())
+
+    def next_analysis(self):
+        """Return the board the engine should search next, or None when every position was analysed.
+
+        The most recently changed board goes first, so the engine follows the action.
+        Positions the engine cannot search (no kings, no legal moves) are skipped.
+        """
+        waiting = [board for board in self.boards.values() if board.fen is not None and board.fen != board.analysed_fen]
+        for board in sorted(waiting, key=lambda board: board.changed_at, reverse=True):
+            board.analysed_fen = board.fen
+            board.best_move = None
+            position = chess.Board(board.fen)
+            if position.is_valid() and any(position.legal_moves):
+                return board
+        return None
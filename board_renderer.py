@@ -0,0 +1,96 @@
+import chess
+import chess.svg
+from PyQt5.QtCore import QByteArray, Qt
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtSvg import QSvgRenderer
+from PyQt5.QtWidgets import QGraphicsPixmapItem
+from metrics import metrics
+
+# Natural size of chess.svg boards: eight squares plus the coordinate margin on each side
+board_size = 8 * chess.svg.SQUARE_SIZE + 2 * chess.svg.MARGIN
+
+
+def rasterize_svg(svg, width, height):
+    """Render an SVG string into a transparent QPixmap of the given size."""
+    renderer = QSvgRenderer(QByteArray(svg.encode('utf-8')))
+    image = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    renderer.render(painter)
+    painter.end()
+    return QPixmap.fromImage(image)
+
+
+class BoardRenderer:
+    """Draw a chess.Board on a QGraphicsScene with one pixmap item per square.
+
+    The board background and each piece sprite are rasterized once per size;
+    render() only touches the squares whose occupant changed.
+    """
+    def __init__(self, scene, size=board_size):
+        self.scene = scene
+        self.size = None
+        self.background = None  # Pixmap item for the empty board with coordinates
+        self.items = {}  # Square -> pixmap item of the piece on it
+        self.pieces = {}  # Square -> piece currently drawn there
+        self.sprites = {}  # Piece symbol -> pixmap at the current size
+        self.updated = 0  # Number of squares redrawn by the last render()
+        self.resize(size)
+
+    def resize(self, size):
+        """Rasterize the background for a new size; sprites are regenerated lazily."""
+        if size == self.size:
+            return
+        self.size = size
+        self.margin = chess.svg.MARGIN * size / board_size
+        self.square_size = chess.svg.SQUARE_SIZE * size / board_size
+        self.sprites = {}
+
+        if self.background is not None:
+            self.scene.removeItem(self.background)
+        self.background = self.scene.addPixmap(rasterize_svg(chess.svg.board(chess.BaseBoard(None), size=size), size, size))
+        self.background.setZValue(0)
+
+        # Every square item needs the new sprite and position
+        for square, piece in self.pieces.items():
+            self.draw(square, piece)
+
+    def sprite(self, piece):
+        symbol = piece.symbol()
+        if symbol not in self.sprites:
+            side = round(self.square_size)
+            self.sprites[symbol] = rasterize_svg(chess.svg.piece(piece, size=side), side, side)
+        return self.sprites[symbol]
+
+    def square_position(self, square):
+        # White at the bottom: file a on the left, rank 8 at the top
+        x = self.margin + chess.square_file(square) * self.square_size
+        y = self.margin + (7 - chess.square_rank(square)) * self.square_size
+        return x, y
+
+    def draw(self, square, piece):
+        item = self.items.get(square)
+        if piece is None:
+            if item is not None:
+                item.setVisible(False)
+            return
+        if item is None:
+            item = QGraphicsPixmapItem()
+            item.setZValue(1)
+            self.scene.addItem(item)
+            self.items[square] = item
+        item.setPixmap(self.sprite(piece))
+        item.setPos(*self.square_position(square))
+        item.setVisible(True)
+
+    def render(self, board):
+        """Bring the scene in line with the board; returns the redrawn squares in ascending order."""
+        with metrics.timer('render'):
+            pieces = board.piece_map()
+            changed = sorted(square for square in set(pieces) | set(self.pieces) if pieces.get(square) != self.pieces.get(square))
+            for square in changed:
+                self.draw(square, pieces.get(square))
+        self.pieces = pieces
+        self.updated = len(changed)
+        metrics.count('squares_redrawn', self.updated)
+        return changed
@@ -0,0 +1,129 @@
+import functools
+import re
+import numpy as np
+
+# Square codes: 0 is empty, 1-12 the pieces in this order
+piece_letters = 'PNBRQKpnbrqk'
+piece_codes = {letter: code for code, letter in enumerate(piece_letters, start=1)}
+
+# Byte for every code when writing FEN, with '1' standing in for an empty square
+fen_bytes = np.frombuffer(b'1' + piece_letters.encode(), dtype=np.uint8)
+
+# Random 64-bit keys for every (code, square) and for black to move; the empty code
+# hashes to zero so empty squares drop out of the hash
+zobrist_seed = 0x5EED
+_rng = np.random.default_rng(zobrist_seed)
+zobrist_table = _rng.integers(0, 2 ** 64, size=(13, 64), dtype=np.uint64)
+zobrist_table[0] = 0
+zobrist_black = int(_rng.integers(0, 2 ** 64, dtype=np.uint64))
+
+_empty_run = re.compile(r'1{2,}')
+
+
+@functools.lru_cache(maxsize=4096)
+def encode_row(row):
+    """Turn 8 bytes of FEN letters ('1' for empty) into a FEN rank such as 'r3k2r'."""
+    return _empty_run.sub(lambda run: str(len(run.group())), row.decode())
+
+
+class BoardState:
+    """Piece placement as 64 uint8 codes (index 0 is a8, 63 is h1) plus side to move.
+
+    The Zobrist key is kept up to date by set() and update(), so comparing two
+    states or using them as cache keys costs a single integer comparison.
+    """
+    __slots__ = ('squares', 'white_to_move', 'key')
+
+    def __init__(self, squares=None, white_to_move=True):
+        self.squares = np.zeros(64, np.uint8) if squares is None else np.asarray(squares, dtype=np.uint8)
+        self.white_to_move = white_to_move
+        self.key = self.compute_key()
+
+    @classmethod
+    def from_symbols(cls, symbols, white_to_move=True):
+        """Build a state from 64 FEN letters ('' for empty), a8 first."""
+        return cls([piece_codes.get(symbol, 0) for symbol in symbols], white_to_move)
+
+    @classmethod
+    def from_fen(cls, fen):
+        fields = fen.split()
+        codes = []
+        for char in fields[0]:
+            if char.isdigit():
+                codes.extend([0] * int(char))
+            elif char != '/':
+                codes.append(piece_codes[char])
+        return cls(codes, len(fields) < 2 or fields[1] == 'w')
+
+    def compute_key(self):
+        key = int(np.bitwise_xor.reduce(zobrist_table[self.squares, np.arange(64)]))
+        return key if self.white_to_move else key ^ zobrist_black
+
+    def copy(self):
+        state = BoardState.__new__(BoardState)
+        state.squares = self.squares.copy()
+        state.white_to_move = self.white_to_move
+        state.key = self.key
+        return state
+
+    def set(self, index, code):
+        """Put a piece code (0 to clear) on one square, updating the key incrementally."""
+        old = self.squares[index]
+        self.key ^= int(zobrist_table[old, index] ^ zobrist_table[code, index])
+        self.squares[index] = code
+
+    def update(self, indices, codes):
+        """Put codes on several squares at once, updating the key incrementally."""
+        indices = np.asarray(indices, dtype=np.intp)
+        codes = np.asarray(codes, dtype=np.uint8)
+        changes = zobrist_table[self.squares[indices], indices] ^ zobrist_table[codes, indices]
+        self.key ^= int(np.bitwise_xor.reduce(changes)) if len(indices) else 0
+        self.squares[indices] = codes
+
+    def set_turn(self, white_to_move):
+        if white_to_move != self.white_to_move:
+            self.key ^= zobrist_black
+            self.white_to_move = white_to_move
+
+    def diff(self, other):
+        """Return the indices of the squares whose contents differ from another state."""
+        return np.flatnonzero(self.squares != other.squares)
+
+    def symbol(self, index):
+        """Return the FEN letter on a square, '' when it is empty."""
+        code = self.squares[index]
+        return piece_letters[code - 1] if code else ''
+
+    def placement(self):
+        """Return the piece placement field of the FEN."""
+        letters = fen_bytes[self.squares].tobytes()
+        return '/'.join(encode_row(letters[start:start + 8]) for start in range(0, 64, 8))
+
+    def castling_rights(self):
+        """Return the castling field allowed by the placement: king and rook still on their home squares."""
+        k, r, K, R = (piece_codes[letter] for letter in 'krKR')
+        squares = self.squares
+        rights = ''
+        if squares[60] == K:
+            rights += 'K' if squares[63] == R else ''
+            rights += 'Q' if squares[56] == R else ''
+        if squares[4] == k:
+            rights += 'k' if squares[7] == r else ''
+            rights += 'q' if squares[0] == r else ''
+        return rights or '-'
+
+    def fen(self, castling=None, en_passant='-', halfmove_clock=0, fullmove_number=1):
+        """Return a full FEN; castling defaults to what the placement allows."""
+        castling = self.castling_rights() if castling is None else castling
+        turn = 'w' if self.white_to_move else 'b'
+        return f"{self.placement()} {turn} {castling} {en_passant} {halfmove_clock} {fullmove_number}"
+
+    def __eq__(self, other):
+        return (isinstance(other, BoardState) and self.key == other.key and self.white_to_move == other.white_to_move
+                and np.array_equal(self.squares, other.squares))
+
+    def __hash__(self):
+        return self.key
+
+    def __repr__(self):
+        return f"BoardState('{self.fen()}')"
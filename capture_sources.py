@@ -0,0 +1,130 @@
+import abc
+import glob
+import os
+import sys
+import time
+import cv2
+
+
+class CaptureSource(abc.ABC):
+    """Interface for anything that produces BGR frames for the pipeline."""
+    @abc.abstractmethod
+    def read(self):
+        """Return the next BGR frame, or None if no frame is available."""
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        # Yield frames until the source runs dry
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReplaySource(CaptureSource):
+    """Replay frames from a directory of PNGs or from a video file.
+
+    With realtime=True frames are paced at the recorded rate: the video's frame
+    rate, or for a directory the spacing of the files' modification times. An
+    explicit fps overrides both. Otherwise frames come as fast as they decode.
+    """
+    def __init__(self, path, fps=None, realtime=False, loop=False):
+        self.path = path
+        self.realtime = realtime
+        self.loop = loop
+        self.index = 0  # Number of frames read since the last (re)start
+        self.start_time = None
+        self.video = None
+        self.files = None
+
+        if os.path.isdir(path):
+            self.files = sorted(glob.glob(os.path.join(path, '*.png')))
+            if not self.files:
+                raise ValueError(f"No PNG frames found in {path}")
+            # Recorded offset of every frame from the first one
+            mtimes = [os.path.getmtime(f) for f in self.files]
+            self.offsets = [t - mtimes[0] for t in mtimes]
+        else:
+            self.video = cv2.VideoCapture(path)
+            if not self.video.isOpened():
+                raise ValueError(f"Could not open video {path}")
+            fps = fps or self.video.get(cv2.CAP_PROP_FPS) or None
+        self.fps = fps
+
+    def frame_offset(self, index):
+        """Return when frame `index` was recorded, in seconds after the first frame."""
+        if self.fps:
+            return index / self.fps
+        if self.files is not None:
+            return self.offsets[index]
+        return 0.0
+
+    def read(self):
+        frame = self.next_frame()
+        if frame is None and self.loop and self.index > 0:
+            self.rewind()
+            frame = self.next_frame()
+        if frame is None:
+            return None
+
+        if self.realtime:
+            # Wait until the frame is due relative to the first frame
+            if self.start_time is None:
+                self.start_time = time.perf_counter()
+            delay = self.start_time + self.frame_offset(self.index) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.index += 1
+        return frame
+
+    def next_frame(self):
+        if self.files is not None:
+            if self.index >= len(self.files):
+                return None
+            return cv2.imread(self.files[self.index])
+        ok, frame = self.video.read()
+        return frame if ok else None
+
+    def rewind(self):
+        self.index = 0
+        self.start_time = None
+        if self.video is not None:
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def close(self):
+        if self.video is not None:
+            self.video.release()
+
+
+if __name__ == '__main__':
+    # Replay a recording through the recognizer and report end-to-end throughput:
+    #   python capture_sources.py <png-folder-or-video> [--realtime]
+    from readchess import BoardRecognizer, IncrementalRecognizer
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: python capture_sources.py <png-folder-or-video> [--realtime]")
+
+    recognizer = IncrementalRecognizer(BoardRecognizer(batch=True))
+    last_fen = None
+    frames = 0
+    evaluated = 0
+    start = time.perf_counter()
+    with ReplaySource(sys.argv[1], realtime='--realtime' in sys.argv) as source:
+        for frame in source:
+            result = recognizer.recognize(frame)
+            frames += 1
+            evaluated += recognizer.evaluated
+            if result.fen != last_fen:
+                print(f"{frames}: {result.fen}")
+                last_fen = result.fen
+    elapsed = time.perf_counter() - start
+    print(f"\n{frames} frames in {elapsed:.2f}s ({frames / elapsed:.1f} fps), {evaluated} squares re-classified")
@@ -0,0 +1,173 @@
+import threading
+import chess
+import chess.engine
+from PyQt5.QtCore import QThread, pyqtSignal
+from analysis_cache import Analysis
+from metrics import metrics
+
+# Path to the UCI engine executable, the default search depth, and the time budget
+# (in seconds) the GUI gives each search
+engine_path = "./stockfish/stockfish-windows-x86-64-avx2.exe"  # Update with the actual path to Stockfish executable
+search_depth = 15
+search_time = 1.0
+
+
+class EngineWorker(QThread):
+    """Runs engine searches off the GUI thread and delivers results through Qt signals.
+
+    Only the newest position matters: a new request stops the search in progress,
+    and results for superseded positions are never emitted. With an AnalysisCache,
+    positions already analysed deep enough are answered without searching.
+
+    A search ends at `depth` or after `time_budget` seconds, whichever comes first
+    (either may be None). Every completed depth is streamed through
+    analysis_progress, so a first move is available long before the search ends.
+    """
+    best_move_ready = pyqtSignal(str, str)  # (FEN searched, best move in UCI notation)
+    analysis_progress = pyqtSignal(str, object)  # (FEN searched, Analysis at the depth just completed)
+    engine_failed = pyqtSignal(str)  # Error message when the engine cannot be started or crashes
+
+    def __init__(self, path=engine_path, depth=search_depth, time_budget=None, multipv=1, cache=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.depth = depth
+        self.time_budget = time_budget
+        self.multipv = multipv
+        self.cache = cache
+        self.condition = threading.Condition()
+        self.pending = None  # (request id, board) waiting to be searched
+        self.request_id = 0  # Id of the newest request; older results are stale
+        self.search = None  # Search in progress, can be stopped from any thread
+        self.running = True
+
+    def request(self, board):
+        """Search a copy of the board, superseding any older request. Returns the request id."""
+        with self.condition:
+            self.request_id += 1
+            self.pending = (self.request_id, board.copy())
+            self.stop_search()
+            self.condition.notify()
+            return self.request_id
+
+    def cancel(self):
+        """Drop any pending request and stop the search in progress."""
+        with self.condition:
+            self.request_id += 1
+            self.pending = None
+            self.stop_search()
+
+    def stop(self):
+        """Shut the worker down and wait for the engine to quit."""
+        with self.condition:
+            self.running = False
+            self.pending = None
+            self.stop_search()
+            self.condition.notify()
+        self.wait()
+
+    def stop_search(self):
+        # Called with the condition held
+        if self.search is not None:
+            self.search.stop()
+
+    def limit(self):
+        return chess.engine.Limit(depth=self.depth, time=self.time_budget)
+
+    def open_engine(self):
+        try:
+            return chess.engine.SimpleEngine.popen_uci(self.path)
+        except (OSError, chess.engine.EngineError) as e:
+            self.engine_failed.emit(str(e))
+            return None
+
+    def close_engine(self, engine):
+        # A crashed engine cannot answer quit; closing the transport is enough then
+        try:
+            engine.quit()
+        except (chess.engine.EngineError, TimeoutError):
+            engine.close()
+
+    def run(self):
+        engine = self.open_engine()
+        if engine is None:
+            return
+
+        try:
+            while True:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.pending is not None or not self.running)
+                    if not self.running:
+                        return
+                    request_id, board = self.pending
+                    self.pending = None
+
+                    # Answer from the cache when the position was already searched deep enough;
+                    # without a depth limit nothing is deep enough, but a cached line still
+                    # gives the GUI something to show right away
+                    cached = self.cache.get(board, self.depth or 1, self.multipv) if self.cache is not None else None
+
+                fen = board.fen()
+                if cached is not None:
+                    metrics.count('engine_cache_hits')
+                    self.analysis_progress.emit(fen, cached)
+                    if self.depth is not None:
+                        self.best_move_ready.emit(fen, cached.best_move)
+                        continue
+
+                try:
+                    with self.condition:
+                        # Superseded while the cache was consulted; the newer request is pending
+                        if request_id != self.request_id:
+                            continue
+                        self.search = engine.analysis(board, self.limit(), multipv=self.multipv)
+                    metrics.count('engine_searches')
+                    with metrics.timer('engine_search'):
+                        best = self.stream(request_id, fen)
+                except chess.engine.EngineError as e:
+                    # EngineTerminatedError included: the engine died on this position (illegal
+                    # positions crash some engines), so report it and start a fresh process
+                    with self.condition:
+                        self.search = None
+                    metrics.count('engine_failures')
+                    self.engine_failed.emit(f'Engine failed on {fen}: {e}')
+                    self.close_engine(engine)
+                    engine = self.open_engine()
+                    if engine is None:
+                        return
+                    continue
+
+                # Keep whatever depth was reached, even for a search that got superseded
+                if self.cache is not None:
+                    self.cache.put(board, Analysis.from_infos(self.search.multipv), self.multipv)
+
+                with self.condition:
+                    self.search = None
+                    stale = request_id != self.request_id
+                if not stale and best.move is not None:
+                    self.best_move_ready.emit(fen, best.move.uci())
+        finally:
+            if engine is not None:
+                self.close_engine(engine)
+            if self.cache is not None:
+                self.cache.close()
+
+    def stream(self, request_id, fen):
+        """Emit analysis_progress for every completed depth of the current search and return its best move."""
+        # The engine is told the time budget too; the timer only guards against overshooting it
+        deadline = threading.Timer(self.time_budget, self.search.stop) if self.time_budget else None
+        if deadline is not None:
+            deadline.start()
+        try:
+            completed = 0
+            for info in self.search:
+                # A line with a principal variation closes an iteration; report the first
+                # multipv line of each new depth
+                depth = info.get('depth', 0)
+                if info.get('pv') and info.get('multipv', 1) == 1 and depth > completed:
+                    completed = depth
+                    if request_id == self.request_id:
+                        self.analysis_progress.emit(fen, Analysis.from_infos([info]))
+            return self.search.wait()
+        finally:
+            if deadline is not None:
+                deadline.cancel()
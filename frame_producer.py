@@ -0,0 +1,92 @@
+import threading
+import time
+from metrics import metrics
+
+# Smoothing factor for the moving average of downstream processing time
+processing_smoothing = 0.2
+
+# Capture is paced to leave this much headroom over the measured processing time
+processing_headroom = 1.2
+
+# Range of capture rates; targets outside it are clamped
+min_capture_fps = 1
+max_capture_fps = 30
+
+
+class LatestFrameSlot:
+    """Single-frame slot between a producer and a consumer; a new frame replaces one not yet taken."""
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.frame = None
+        self.timestamp = None
+        self.sequence = 0  # Number of frames ever put into the slot
+        self.dropped = 0  # Frames replaced before anyone took them
+
+    def put(self, frame, timestamp):
+        with self.condition:
+            if self.frame is not None:
+                self.dropped += 1
+                metrics.count('frames_dropped')
+            self.frame = frame
+            self.timestamp = timestamp
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def take(self, timeout=0):
+        """Return (frame, timestamp) and empty the slot, or None if no frame arrives within timeout seconds."""
+        with self.condition:
+            if self.frame is None and timeout:
+                self.condition.wait_for(lambda: self.frame is not None, timeout)
+            if self.frame is None:
+                return None
+            frame, timestamp = self.frame, self.timestamp
+            self.frame = None
+            self.timestamp = None
+            return frame, timestamp
+
+
+class CaptureProducer:
+    """Background thread that grabs frames into a LatestFrameSlot at an adaptive rate."""
+    def __init__(self, capture, fps=15, min_fps=min_capture_fps, max_fps=max_capture_fps):
+        self.capture = capture  # Callable returning a frame or None; called on the producer thread
+        self.fps = fps  # Target frame rate when downstream keeps up
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.slot = LatestFrameSlot()
+        self.processing_time = 0.0  # Moving average of downstream processing time per frame
+        self.capture_time = 0.0  # Duration of the last grab
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def report(self, seconds):
+        """Tell the producer how long the consumer spent on the last frame."""
+        self.processing_time += processing_smoothing * (seconds - self.processing_time)
+
+    def interval(self):
+        """Return the current time between grabs, adapted to downstream processing time."""
+        fps = min(max(self.fps, self.min_fps), self.max_fps)
+        interval = max(1 / fps, self.processing_time * processing_headroom)
+        return min(max(interval, 1 / self.max_fps), 1 / self.min_fps)
+
+    def current_fps(self):
+        return 1 / self.interval()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            start = time.perf_counter()
+            frame = self.capture()
+            self.capture_time = time.perf_counter() - start
+            if frame is not None:
+                self.slot.put(frame, time.time())
+            self.stop_event.wait(max(0.0, self.interval() - (time.perf_counter() - start)))
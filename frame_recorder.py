@@ -0,0 +1,158 @@
+import bisect
+import collections
+import json
+import os
+import queue
+import threading
+import time
+import cv2
+import numpy as np
+from metrics import metrics
+
+# Archive location and bounds: the oldest frames are deleted once the archive holds more
+# than max_bytes, or frames older than max_age seconds (None keeps them regardless of age)
+recording_folder = 'recordings'
+max_bytes = 512 * 1024 * 1024
+max_age = None
+
+# Frames waiting for the writer; when it falls behind, new frames are dropped rather than
+# blocking capture
+queue_frames = 32
+
+# Fast PNG compression keeps the writer ahead of capture; the files stay lossless
+png_compression = 1
+
+index_name = 'index.jsonl'
+
+
+class FrameRecorder:
+    """Opt-in archive of captured frames, written by a background thread.
+
+    record() only copies the frame and queues it, so capture never waits on disk.
+    Every written frame is appended to index.jsonl with its timestamp and recognized
+    FEN; the archive rotates by size or age. latest() answers from memory.
+    """
+    def __init__(self, folder=recording_folder, max_bytes=max_bytes, max_age=max_age, queue_size=queue_frames):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last = None  # (frame, timestamp, fen) of the newest frame queued for writing
+        self.sequence = 0  # Numbers the files, so frames within one millisecond never share one
+        self.dropped = 0  # Frames not recorded because the writer was behind
+        self.entries = collections.deque()  # Index entries on disk, oldest first
+        self.times = collections.deque()  # Their timestamps, for lookups by time
+        self.total_bytes = 0
+        self.dead_lines = 0  # Evicted entries still present in the index file
+        self.lock = threading.Lock()  # Guards entries/times against readers on other threads
+
+        os.makedirs(folder, exist_ok=True)
+        self.index_path = os.path.join(folder, index_name)
+        self.load_index()
+        self.index = open(self.index_path, 'a')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def load_index(self):
+        # Resume an existing archive, skipping entries whose file is gone
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                if os.path.exists(os.path.join(self.folder, entry['file'])):
+                    self.entries.append(entry)
+                    self.times.append(entry['time'])
+                    self.total_bytes += entry['bytes']
+                    self.sequence = max(self.sequence, entry.get('sequence', -1) + 1)
+        self.rewrite_index()
+
+    def record(self, frame, timestamp=None, fen=None):
+        """Queue a BGR frame for the archive without blocking; returns False if it was dropped."""
+        timestamp = time.time() if timestamp is None else timestamp
+        # Capture buffers can be reused, so the writer gets its own copy
+        frame = np.array(frame, copy=True)
+        try:
+            self.queue.put_nowait((self.sequence, frame, timestamp, fen))
+        except queue.Full:
+            self.dropped += 1
+            metrics.count('frames_not_recorded')
+            return False
+        self.sequence += 1
+        self.last = (frame, timestamp, fen)
+        return True
+
+    def latest(self):
+        """Return (frame, timestamp, fen) of the newest frame queued for the archive, or None."""
+        return self.last
+
+    def find(self, timestamp):
+        """Return the index entry of the archived frame closest to the timestamp, or None."""
+        with self.lock:
+            if not self.times:
+                return None
+            position = bisect.bisect_left(self.times, timestamp)
+            candidates = [i for i in (position - 1, position) if 0 <= i < len(self.times)]
+            best = min(candidates, key=lambda i: abs(self.times[i] - timestamp))
+            return dict(self.entries[best])
+
+    def load(self, entry):
+        """Read an archived frame back from an index entry."""
+        return cv2.imread(os.path.join(self.folder, entry['file']))
+
+    def close(self):
+        """Write out the queued frames and stop the writer."""
+        self.queue.put(None)
+        self.thread.join()
+        self.index.close()
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            with metrics.timer('record'):
+                self.write(*item)
+
+    def write(self, sequence, frame, timestamp, fen):
+        filename = f'frame_{int(timestamp * 1000)}_{sequence:08d}.png'
+        path = os.path.join(self.folder, filename)
+        if not cv2.imwrite(path, frame, [cv2.IMWRITE_PNG_COMPRESSION, png_compression]):
+            return
+        entry = {'file': filename, 'sequence': sequence, 'time': timestamp, 'fen': fen, 'bytes': os.path.getsize(path)}
+        self.index.write(json.dumps(entry) + '\n')
+        self.index.flush()
+        with self.lock:
+            self.entries.append(entry)
+            self.times.append(timestamp)
+            self.total_bytes += entry['bytes']
+        self.rotate(timestamp)
+
+    def rotate(self, now):
+        # Delete the oldest frames until the archive is back within its bounds
+        while self.entries and (self.total_bytes > self.max_bytes
+                                or (self.max_age is not None and now - self.entries[0]['time'] > self.max_age)):
+            with self.lock:
+                entry = self.entries.popleft()
+                self.times.popleft()
+                self.total_bytes -= entry['bytes']
+            try:
+                os.remove(os.path.join(self.folder, entry['file']))
+            except FileNotFoundError:
+                pass
+            self.dead_lines += 1
+
+        # Compact the index once evicted lines outnumber live ones, so it stays O(live frames)
+        if self.dead_lines > len(self.entries):
+            self.index.close()
+            self.rewrite_index()
+            self.index = open(self.index_path, 'a')
+
+    def rewrite_index(self):
+        with self.lock:
+            lines = [json.dumps(entry) + '\n' for entry in self.entries]
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'w') as f:
+            f.writelines(lines)
+        os.replace(temporary, self.index_path)
+        self.dead_lines = 0
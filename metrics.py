@@ -0,0 +1,145 @@
+import collections
+import json
+import threading
+import time
+import numpy as np
+
+# Samples kept per histogram and the quantiles reported for it
+window_size = 512
+quantiles = (0.5, 0.9, 0.99)
+
+# Prefix of every exported Prometheus metric name
+prometheus_prefix = 'chess_'
+
+
+class RollingHistogram:
+    """Durations (in seconds) of the last `window` observations plus lifetime count and sum."""
+    def __init__(self, window=window_size):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self):
+        samples = np.array(self.samples) if self.samples else np.zeros(1)
+        summary = {
+            'count': self.count,
+            'sum': self.total,
+            'mean': float(samples.mean()),
+            'max': float(samples.max()),
+        }
+        for q in quantiles:
+            summary[f'p{round(q * 100)}'] = float(np.quantile(samples, q))
+        return summary
+
+
+class Timer:
+    """Context manager that records the duration of its block into a histogram."""
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+
+class NullTimer:
+    """Stand-in returned while metrics are disabled, so timed blocks cost almost nothing."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+null_timer = NullTimer()
+
+
+class Metrics:
+    """Registry of pipeline timers and counters, safe to update from any thread.
+
+    Disabled by default: timer() then hands back a shared no-op context manager and
+    count()/observe() return right away.
+    """
+    def __init__(self, enabled=False, window=window_size):
+        self.enabled = enabled
+        self.window = window
+        self.lock = threading.Lock()
+        self.histograms = {}  # Stage name -> RollingHistogram of durations
+        self.counters = collections.Counter()  # Event name -> count
+
+    def timer(self, name):
+        """Time a `with` block under `name`."""
+        return Timer(self, name) if self.enabled else null_timer
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += n
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """Return {'timers': {name: summary}, 'counters': {name: count}}."""
+        with self.lock:
+            return {
+                'timers': {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+                'counters': dict(sorted(self.counters.items())),
+            }
+
+    def to_json(self, indent=2):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self):
+        """Render the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, summary in snapshot['timers'].items():
+            metric = f'{prometheus_prefix}{name}_seconds'
+            lines.append(f'# TYPE {metric} summary')
+            for q in quantiles:
+                lines.append(f'{metric}{{quantile="{q}"}} {summary[f"p{round(q * 100)}"]:.6f}')
+            lines.append(f'{metric}_sum {summary["sum"]:.6f}')
+            lines.append(f'{metric}_count {summary["count"]}')
+        for name, value in snapshot['counters'].items():
+            metric = f'{prometheus_prefix}{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def format_table(self):
+        """Return a plain-text table of the snapshot for the debug panel."""
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<16}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"]
+        for name, s in snapshot['timers'].items():
+            lines.append(f"{name:<16}{s['count']:>8}{s['mean'] * 1000:>10.2f}{s['p50'] * 1000:>10.2f}"
+                         f"{s['p90'] * 1000:>10.2f}{s['p99'] * 1000:>10.2f}")
+        if snapshot['counters']:
+            lines.append('')
+            lines.extend(f'{name:<24}{value:>8}' for name, value in snapshot['counters'].items())
+        return '\n'.join(lines)
+
+
+# Process-wide registry used by the pipeline modules
+metrics = Metrics()
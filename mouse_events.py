@@ -1,7 +1,7 @@
 class MouseEventsMixin:
     def mouse_down(self, event):
-        # Capture the start point for the rectangle
-        x, y = self.mouse_tracker.get_position()
+        # Capture the start point for the rectangle, in screen coordinates of the event
+        x, y = event.x_root, event.y_root
         self.start_point = (x, y)
         self.mouse_down_label.config(text=f"Mouse Down Coordinates: ({x}, {y})")
         self.is_drawing = True
@@ -9,13 +9,13 @@ class MouseEventsMixin:
     def mouse_drag(self, event):
         if self.is_drawing:
             # Update the rectangle as the mouse is dragged
-            x, y = self.mouse_tracker.get_position()
+            x, y = event.x_root, event.y_root
             self.end_point = (x, y)
             self.draw_rectangle()
 
     def mouse_up(self, event):
         # Capture the end point for the rectangle
-        x, y = self.mouse_tracker.get_position()
+        x, y = event.x_root, event.y_root
         self.end_point = (x, y)
         self.mouse_up_label.config(text=f"Mouse Up Coordinates: ({x}, {y})")
         self.is_drawing = False
@@ -27,13 +27,21 @@ class MouseEventsMixin:
     def draw_rectangle(self):
         # Clear previous rectangle before drawing a new one
         self.canvas.delete("selection_rect")
-        # Draw the rectangle on the canvas dynamically
+        # Draw the rectangle on the canvas dynamically (points are in screen coordinates)
+        left, top = self.canvas.winfo_rootx(), self.canvas.winfo_rooty()
         self.canvas.create_rectangle(
-            self.start_point[0], self.start_point[1], self.end_point[0], self.end_point[1],
+            self.start_point[0] - left, self.start_point[1] - top, self.end_point[0] - left, self.end_point[1] - top,
             outline='red', width=2, tags="selection_rect"
         )
 
     def update_selected_area(self):
         # Calculate the selected area and update the label
         if self.start_point and self.end_point:
-            x1, y1
+            x1, y1 = min(self.start_point[0], self.end_point[0]), min(self.start_point[1], self.end_point[1])
+            x2, y2 = max(self.start_point[0], self.end_point[0]), max(self.start_point[1], self.end_point[1])
+            self.rect = (x1, y1, x2 - x1, y2 - y1)
+            self.selected_area_label.config(text=f"Selected Area: {self.rect}")
+
+            # A hand-drawn region replaces any board found earlier; checking it against that
+            # board's square levels would send process_frame back to find_board
+            self.locator.geometry = None
@@ -0,0 +1,60 @@
+import chess
+
+# Longest run of plies looked for between two recognized positions (a missed frame
+# can hide the opponent's reply)
+max_plies = 2
+
+
+class MoveTracker:
+    """Follow a game from consecutive recognized positions by replaying the legal moves between them.
+
+    Pushing real moves keeps castling rights, en passant squares, the move clocks and
+    the move stack correct. When no short sequence of legal moves explains the new
+    placement (a new game, a misread square), the board is reset to the recognized FEN.
+    """
+    def __init__(self, board=None, max_plies=max_plies):
+        self.board = board if board is not None else chess.Board()
+        self.max_plies = max_plies
+        self.resets = 0  # Number of updates that fell back to a full reset
+
+    def update(self, fen):
+        """Bring the board to the recognized FEN. Returns the moves pushed, or None after a reset."""
+        placement = fen.split()[0]
+        if placement == self.board.board_fen():
+            return []
+
+        moves = self.find_moves(placement)
+        if moves is None:
+            self.board.set_fen(fen)
+            self.resets += 1
+            return None
+        for move in moves:
+            self.board.push(move)
+        return moves
+
+    def find_moves(self, placement, plies=None):
+        """Return the shortest list of legal moves from the board to the placement, or None."""
+        plies = self.max_plies if plies is None else plies
+        target = chess.BaseBoard(placement)
+        for depth in range(1, plies + 1):
+            moves = self.search(target, depth)
+            if moves is not None:
+                return moves
+        return None
+
+    def search(self, target, depth):
+        # Depth-first over legal moves, restoring the board on the way out. Occupancy is
+        # a single integer compare, so full placements are only compared when it matches
+        for move in list(self.board.legal_moves):
+            self.board.push(move)
+            try:
+                if depth == 1:
+                    if self.board.occupied == target.occupied and chess.BaseBoard.__eq__(self.board, target):
+                        return [move]
+                else:
+                    rest = self.search(target, depth - 1)
+                    if rest is not None:
+                        return [move] + rest
+            finally:
+                self.board.pop()
+        return None
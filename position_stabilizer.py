@@ -0,0 +1,64 @@
+import collections
+import time
+import numpy as np
+from readchess import min_vote_share, min_batch_score
+
+# A position is published once it was read in stable_frames consecutive frames or held
+# for stable_seconds, and every square's mean confidence over those frames reaches
+# min_square_confidence. window_frames bounds the history kept per square
+stable_frames = 3
+stable_seconds = 0.5
+window_frames = 8
+
+# The classifiers accept a piece at these scores and report empty squares at 0.5 or
+# more, so a stricter bar would hold back positions they read the same way every frame
+min_square_confidence = min(min_vote_share, min_batch_score)
+
+
+class PositionStabilizer:
+    """Debounce recognized positions so transient frames (drags, animations) never reach the engine.
+
+    push() every RecognitionResult; it returns the result once its position has been
+    stable long enough and confidently enough, and None otherwise. Each stable
+    position is published only once.
+    """
+    def __init__(self, frames=stable_frames, seconds=stable_seconds, min_confidence=min_square_confidence,
+                 window=window_frames):
+        self.frames = frames
+        self.seconds = seconds
+        self.min_confidence = min_confidence
+        self.history = collections.deque(maxlen=max(window, frames))  # (key, timestamp, per-square confidences)
+        self.published_key = None
+        self.published = None  # Last published RecognitionResult
+
+    def reset(self):
+        self.history.clear()
+        self.published_key = None
+        self.published = None
+
+    def push(self, result, timestamp=None):
+        """Record a recognized frame; return the result if its position just became stable, else None."""
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        confidences = np.fromiter(result.confidences.values(), dtype=np.float32, count=len(result.confidences))
+        self.history.append((result.key, timestamp, confidences))
+        if result.key == self.published_key:
+            return None
+
+        # Trailing run of frames that read the same position
+        streak = []
+        for key, frame_time, frame_confidences in reversed(self.history):
+            if key != result.key:
+                break
+            streak.append((frame_time, frame_confidences))
+        held = timestamp - streak[-1][0]
+        if len(streak) < self.frames and (len(streak) < 2 or held < self.seconds):
+            return None
+
+        # Equal keys already mean every square's label agreed across the streak; the
+        # confidence bar only drops readings the classifiers would not have accepted
+        if np.stack([c for _, c in streak]).mean(axis=0).min() < self.min_confidence:
+            return None
+
+        self.published_key = result.key
+        self.published = result
+        return result
@@ -1,205 +1,657 @@
+import copy
 import cv2
 import numpy as np
 import os
 import glob
+import re
+from metrics import metrics
+from board_state import BoardState, piece_codes
 
 # Define the minimum number of matches needed for ORB feature matching
 min_matches = 20  # You can easily adjust this value here
 special_factor = 20  # Factor for the special image recognition
 
-# Function to clear all .png files in the photos and parser folders
-def clear_photos_and_parser_folders(photo_folder, parser_folder):
-    for folder in [photo_folder, parser_folder]:
-        files = glob.glob(os.path.join(folder, '*.png'))
-        for f in files:
-            os.remove(f)
-
 # Define the path to the templates, photos, and parser folders
 template_folder = 'templates'
+piece_template_folder = 'parser_template'
 photo_folder = 'photos'
 parser_folder = 'parser'
 
-# Clear all PNG files from the photos and parser folders before processing
-if not os.path.exists(photo_folder):
-    os.makedirs(photo_folder)
-
-if not os.path.exists(parser_folder):
-    os.makedirs(parser_folder)
+# Piece template file name patterns, e.g. "black-pawn-dark-square.png" in templates/
+# and "rook-white-lightbg.png" in parser_template/
+piece_template_patterns = [
+    re.compile(r'^(?P<color>black|white)-(?P<piece>[a-z]+)-(?P<shade>light|dark)-square\.png$'),
+    re.compile(r'^(?P<piece>[a-z]+)-(?P<color>black|white)-(?P<shade>light|dark)bg\.png$'),
+]
 
-# Clear the `photos` and `parser` folders
-clear_photos_and_parser_folders(photo_folder, parser_folder)
+# FEN letter for every piece type (lowercase is black)
+fen_symbols = {'pawn': 'p', 'knight': 'n', 'bishop': 'b', 'rook': 'r', 'queen': 'q', 'king': 'k'}
 
-# Load the chessboard image
-image_path = 'template.png'  # Path to your main chessboard image
-image = cv2.imread(image_path)
+# Template file names for the black/white color check
+color_templates = {
+    'black': 'black.png',
+    'white': 'white.png',
+}
 
-# Ensure the image is loaded
-if image is None:
-    raise ValueError(f"Could not load the chessboard image at {image_path}")
-
-# Load the pawn templates from the templates folder
-black_pawn_dark = cv2.imread(os.path.join(template_folder, 'black-pawn-dark-square.png'), 0)  # Load grayscale
-black_pawn_light = cv2.imread(os.path.join(template_folder, 'black-pawn-light-square.png'), 0)
-white_pawn_dark = cv2.imread(os.path.join(template_folder, 'white-pawn-dark-square.png'), 0)
-white_pawn_light = cv2.imread(os.path.join(template_folder, 'white-pawn-light-square.png'), 0)
-
-# Check if the templates are loaded properly
-if black_pawn_dark is None or black_pawn_light is None or white_pawn_dark is None or white_pawn_light is None:
-    raise ValueError("Could not load one or more pawn templates.")
-
-# Function to use ORB feature matching to detect pawns
-def orb_feature_match(square, template, min_matches=min_matches):
-    # Initialize ORB detector
-    orb = cv2.ORB_create()
-
-    # Find keypoints and descriptors in both template and target (square)
-    kp1, des1 = orb.detectAndCompute(template, None)
-    kp2, des2 = orb.detectAndCompute(square, None)
+# Standard and reversed chess notation for rows and columns
+standard_columns = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
+standard_rows = ['1', '2', '3', '4', '5', '6', '7', '8']
+reversed_columns = ['h', 'g', 'f', 'e', 'd', 'c', 'b', 'a']
+reversed_rows = ['8', '7', '6', '5', '4', '3', '2', '1']
 
-    if des1 is None or des2 is None:
-        return False
+# Notation of every square in recognition order (0 is a8, 63 is h1)
+square_names = [column + row for row in reversed_rows for column in standard_columns]
+
+# Every board is resampled to canonical_square_size pixels per square (the size the
+# templates were cut at) before recognition; piece templates are matched at each of
+# template_scales to cover sites that draw pieces larger or smaller within the square
+canonical_square_size = 100
+template_scales = (0.85, 1.0, 1.15)
+
+# ORB detector settings for canonical squares. The default 31 pixel border and patch
+# leave only the middle of a 100 pixel square for keypoints, so a piece got a handful of
+# descriptors and its votes changed with the capture resolution
+orb_settings = {'nfeatures': 50, 'edgeThreshold': 9, 'patchSize': 9, 'nlevels': 3}
+
+# Single-pass ORB classification: a square descriptor votes for the template owning its
+# nearest descriptor if it is closer than max_vote_distance; the winner needs at least
+# min_votes votes and min_vote_share of the square's descriptors
+max_vote_distance = 64
+min_votes = 3
+min_vote_share = 0.5
+
+# Batch classifier settings: canonical square size, inner margin cropped off each
+# square (coordinates and borders), and the minimum score to accept a template
+batch_square_size = 32
+batch_margin = 0.15
+min_batch_score = 0.5
+
+# Incremental recognition settings: per-square fingerprint grid size and the
+# largest fingerprint change (in gray levels) still treated as "unchanged"
+fingerprint_size = 8
+fingerprint_threshold = 12
+
+# Empty-square fast path: squares are sampled on a grid of about empty_square_size pixels
+# per side over their inner part (empty_margin cropped off each side). A square is empty when its mean
+# is within empty_mean_tolerance of its shade and its spread at most empty_std_tolerance
+# above the shade's
+empty_square_size = 16
+empty_margin = 0.2
+empty_mean_tolerance = 12
+empty_std_tolerance = 6
 
-    # Use brute force matcher with Hamming distance
-    bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+# Function to clear all .png files in the photos and parser folders
+def clear_photos_and_parser_folders(photo_folder, parser_folder):
+    for folder in [photo_folder, parser_folder]:
+        files = glob.glob(os.path.join(folder, '*.png'))
+        for f in files:
+            os.remove(f)
 
-    # Match descriptors between template and square
-    matches = bf.match(des1, des2)
+def load_templates(folders=(template_folder, piece_template_folder)):
+    """Load the color templates and every piece template found in the folders as grayscale images.
+
+    Color templates are read from the first folder. Piece templates are named
+    "<color>_<piece>_<shade>", e.g. "white_rook_dark"; the first folder wins on duplicates.
+    """
+    templates = {}
+    for name, filename in color_templates.items():
+        template = cv2.imread(os.path.join(folders[0], filename), cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            raise ValueError(f"Could not load template {filename} from {folders[0]}")
+        templates[name] = template
+
+    for name, path in piece_template_files(folders):
+        template = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            raise ValueError(f"Could not load template {path}")
+        templates[name] = template
+    return templates
+
+def piece_template_files(folders=(template_folder, piece_template_folder)):
+    """Yield (name, path) for every piece template file in the folders; the first folder wins on duplicates."""
+    seen = set()
+    for folder in folders:
+        for filename in sorted(os.listdir(folder)):
+            for pattern in piece_template_patterns:
+                match = pattern.match(filename)
+                if match and match['piece'] in fen_symbols:
+                    name = f"{match['color']}_{match['piece']}_{match['shade']}"
+                    if name not in seen:
+                        seen.add(name)
+                        yield name, os.path.join(folder, filename)
+                    break
+
+def piece_names(templates):
+    """Return the names of the piece templates (everything but the color templates)."""
+    return [name for name in templates if name not in color_templates]
+
+def piece_symbol(name):
+    """Return the FEN letter for a piece template name such as 'white_rook_dark'."""
+    color, piece, _ = name.split('_')
+    symbol = fen_symbols[piece]
+    return symbol.upper() if color == 'white' else symbol
+
+def piece_code(name):
+    """Return the BoardState code for a piece template name, 0 for '' (empty)."""
+    return piece_codes[piece_symbol(name)] if name else 0
+
+def resample(image, width, height):
+    """Resize an image to width x height, averaging when shrinking and interpolating when enlarging."""
+    if image.shape[1] == width and image.shape[0] == height:
+        return image
+    shrinking = width < image.shape[1] or height < image.shape[0]
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR)
+
+def normalize_board(image, square_size=canonical_square_size):
+    """Resample a board image in one pass so every square is square_size pixels wide and high."""
+    square_height = image.shape[0] // 8
+    square_width = image.shape[1] // 8
+    return resample(image[:8 * square_height, :8 * square_width], 8 * square_size, 8 * square_size)
+
+def template_pyramid(template, size, scales=template_scales):
+    """Return the template resampled to size x size with its content scaled by each factor.
+
+    Scales above 1 crop the middle of the enlarged template, scales below 1 pad the
+    shrunken one with its own border, so the square stays size x size either way.
+    """
+    levels = []
+    for scale in scales:
+        scaled_size = max(1, int(round(size * scale)))
+        scaled = resample(template, scaled_size, scaled_size)
+        if scaled_size > size:
+            offset = (scaled_size - size) // 2
+            scaled = scaled[offset:offset + size, offset:offset + size]
+        elif scaled_size < size:
+            before = (size - scaled_size) // 2
+            after = size - scaled_size - before
+            scaled = cv2.copyMakeBorder(scaled, before, after, before, after, cv2.BORDER_REPLICATE)
+        levels.append(scaled)
+    return levels
+
+# ORB detector and matcher built once, with template descriptors computed up front
+class OrbMatcher:
+    def __init__(self, templates, piece_names=(), size=canonical_square_size, scales=template_scales, features=None):
+        # Initialize ORB detector and brute force matcher with Hamming distance
+        self.orb = cv2.ORB_create(**orb_settings)
+        self.bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True)
+
+        # Keypoints and descriptors of every template, computed once here unless they come
+        # precomputed (name -> (keypoints, descriptors)) from a template bundle
+        if features is None:
+            features = self.template_features(templates, piece_names, size, scales)
+        self.keypoints = {name: keypoints for name, (keypoints, _) in features.items()}
+        self.descriptors = {name: descriptors for name, (_, descriptors) in features.items()}
+
+        # Stack the descriptors of every piece template into one matrix so a square is matched
+        # against all pieces in a single call; piece_owners maps each row back to its template
+        self.piece_names = list(piece_names)
+        self.voter = cv2.BFMatcher(cv2.NORM_HAMMING)
+        owned = [(index, self.descriptors[name]) for index, name in enumerate(self.piece_names)
+                 if self.descriptors[name] is not None]
+        self.piece_descriptors = np.vstack([d for _, d in owned]) if owned else None
+        self.piece_owners = np.concatenate([np.full(len(d), index) for index, d in owned]) if owned else None
+
+    def compute(self, image):
+        """Return the ORB descriptors of an image (None if it has no keypoints)."""
+        _, descriptors = self.orb.detectAndCompute(image, None)
+        return descriptors
+
+    def template_features(self, templates, piece_names, size, scales):
+        """Return name -> (keypoints, descriptors) for the templates, either None when nothing was found.
+
+        Color templates are described at the canonical corner size, piece templates over
+        the whole pyramid. Keypoints are (n, 7) float32 rows of x, y, size, angle,
+        response, octave and class id, so they can be stored without cv2 objects.
+        """
+        features = {}
+        corner_size = int(size // 3.6)
+        for name, template in templates.items():
+            if name in piece_names:
+                levels = template_pyramid(template, size, scales)
+            else:
+                levels = [resample(template, corner_size, corner_size)]
+            found = [self.orb.detectAndCompute(level, None) for level in levels]
+            found = [(keypoints, descriptors) for keypoints, descriptors in found if descriptors is not None]
+            if not found:
+                features[name] = (None, None)
+                continue
+            keypoints = np.array([(k.pt[0], k.pt[1], k.size, k.angle, k.response, k.octave, k.class_id)
+                                  for keypoints, _ in found for k in keypoints], dtype=np.float32)
+            features[name] = (keypoints, np.vstack([descriptors for _, descriptors in found]))
+        return features
+
+    def match(self, descriptors, name, min_matches=min_matches):
+        """Return True if the descriptors match the named template well enough."""
+        template_descriptors = self.descriptors[name]
+        if template_descriptors is None or descriptors is None:
+            return False
+
+        # Match descriptors between template and square
+        matches = self.bf.match(template_descriptors, descriptors)
+
+        # Return True if we have enough good matches
+        return len(matches) > min_matches
+
+    def classify(self, descriptors):
+        """Return (name, confidence) of the best piece template for the descriptors, '' if empty."""
+        if descriptors is None or self.piece_descriptors is None:
+            return '', 1.0
+
+        # Every square descriptor votes for the template owning its nearest neighbour
+        matches = self.voter.match(descriptors, self.piece_descriptors)
+        voters = np.array([m.trainIdx for m in matches if m.distance < max_vote_distance], dtype=int)
+        votes = np.bincount(self.piece_owners[voters], minlength=len(self.piece_names))
+
+        best = votes.argmax()
+        share = float(votes[best]) / len(descriptors)
+        if votes[best] < min_votes or share < min_vote_share:
+            # Confidence that the square is empty: 1.0 without any support for a piece, down
+            # to 0.5 as the best template nears both acceptance thresholds
+            evidence = min(votes[best] / min_votes, share / min_vote_share)
+            return '', float(1.0 - 0.5 * evidence)
+        return self.piece_names[best], share
+
+def board_tiles(board):
+    """Return a zero-copy (8, 8, square_height, square_width, ...) view of the squares, rank 8 first."""
+    square_height = board.shape[0] // 8
+    square_width = board.shape[1] // 8
+    shape = (8, 8, square_height, square_width) + board.shape[2:]
+    strides = (board.strides[0] * square_height, board.strides[1] * square_width) + board.strides
+    return np.lib.stride_tricks.as_strided(board, shape, strides, writeable=False)
+
+def square_features(stack, margin=batch_margin):
+    """Turn a (n, h, w) grayscale stack into unit-length intensity + edge feature rows."""
+    n, h, w = stack.shape
+    stack = stack.astype(np.float32)
+
+    # Edge magnitude for the whole stack in one call (tiles are laid out vertically)
+    flat = stack.reshape(n * h, w)
+    edges = cv2.magnitude(cv2.Sobel(flat, cv2.CV_32F, 1, 0), cv2.Sobel(flat, cv2.CV_32F, 0, 1))
+    edges = cv2.GaussianBlur(edges, (3, 3), 0).reshape(n, h, w)
+
+    # Crop the inner part of every square and normalize each half to zero mean, unit length
+    top, left = int(round(h * margin)), int(round(w * margin))
+    features = []
+    for part in (stack, edges):
+        part = part[:, top:h - top, left:w - left].reshape(n, -1)
+        part = part - part.mean(axis=1, keepdims=True)
+        part /= np.maximum(np.linalg.norm(part, axis=1, keepdims=True), 1e-3)
+        features.append(part)
+
+    # Dot products between rows are then the mean of intensity and edge correlations
+    return np.hstack(features) / np.sqrt(2)
+
+class BatchClassifier:
+    """Score all 64 squares against all templates at once with normalized cross-correlation."""
+    def __init__(self, templates, size=batch_square_size, min_score=min_batch_score, scales=template_scales, features=None):
+        # Every pyramid level is its own row; names repeats each template once per scale
+        self.names = [name for name in templates for _ in scales]
+        self.size = size
+        self.min_score = min_score
+
+        # Resample every template to the square size at each scale and precompute its
+        # features, unless a template bundle already holds them
+        if features is None:
+            stack = np.stack([level for t in templates.values() for level in template_pyramid(t, size, scales)])
+            features = square_features(stack)
+        self.template_features = features
+
+    def normalize_board(self, gray):
+        """Resample a grayscale board into a (64, size, size) stack of squares, rank 8 first."""
+        square_height = gray.shape[0] // 8
+        square_width = gray.shape[1] // 8
+        board = cv2.resize(gray[:8 * square_height, :8 * square_width], (8 * self.size, 8 * self.size), interpolation=cv2.INTER_AREA)
+        return board_tiles(board).reshape(64, self.size, self.size)
+
+    def normalize_squares(self, gray, indices):
+        """Resample only the given squares (0 is a8, 63 is h1) into a (n, size, size) stack."""
+        tiles = board_tiles(gray)
+        size = (self.size, self.size)
+        return np.stack([cv2.resize(tiles[index // 8, index % 8], size, interpolation=cv2.INTER_AREA) for index in indices])
+
+    def classify(self, stack):
+        """Return (labels, scores) for a square stack; labels index self.names, -1 means empty."""
+        scores = square_features(stack) @ self.template_features.T
+        best = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(stack)), best]
+        labels = np.where(confidence >= self.min_score, best, -1)
+
+        # Confidence of the chosen label: the score for pieces, its complement for empty squares
+        confidence = np.clip(np.where(labels >= 0, confidence, 1.0 - confidence), 0.0, 1.0)
+        return labels, confidence
+
+class SquareTheme:
+    """Light and dark square statistics learned from one board, used to skip classifying empty squares."""
+    def __init__(self, gray, size=empty_square_size):
+        self.size = size
+
+        # The bottom-left square (a1, or h8 when flipped) is dark and its right neighbour
+        # light; their top-left corners (the region determine_prefix reads) are background.
+        # Median statistics shrug off a coordinate label drawn in the corner
+        square_height = gray.shape[0] // 8
+        square_width = gray.shape[1] // 8
+        corner_height = max(2, int(square_height // 3.6))
+        corner_width = max(2, int(square_width // 3.6))
+        top = 7 * square_height
+        light = gray[top:top + corner_height, square_width:square_width + corner_width]
+        dark = gray[top:top + corner_height, :corner_width]
+        self.means = np.empty(2, np.float32)
+        self.stds = np.empty(2, np.float32)
+        for shade, region in enumerate((light, dark)):
+            median = np.median(region)
+            self.means[shade] = median
+            self.stds[shade] = 1.4826 * np.median(np.abs(region.astype(np.float32) - median))
+
+        # Shade of every square (0 light, 1 dark), rank 8 first
+        self.shades = np.add.outer(np.arange(8), np.arange(8)).ravel() % 2
+
+    @property
+    def valid(self):
+        # Without a clear checker pattern the statistics cannot tell the shades apart
+        return abs(float(self.means[0] - self.means[1])) > 2 * empty_mean_tolerance
+
+    def inner_samples(self, gray, indices):
+        """Return an (n, k) grid of about size x size pixels sampled from the inner part of each square."""
+        tiles = board_tiles(gray)
+        height, width = tiles.shape[2:4]
+        top, left = int(round(height * empty_margin)), int(round(width * empty_margin))
+        step_y = max(1, (height - 2 * top) // self.size)
+        step_x = max(1, (width - 2 * left) // self.size)
+        inner = tiles[:, :, top:height - top:step_y, left:width - left:step_x]
+        return inner.reshape(64, -1)[indices].astype(np.float32)
+
+    def empty_squares(self, gray, indices):
+        """Return (empty mask, confidences) for the given squares (0 is a8, 63 is h1)."""
+        samples = self.inner_samples(gray, indices)
+        shades = self.shades[indices]
+        distance = np.abs(samples.mean(axis=1) - self.means[shades]) / empty_mean_tolerance
+        empty = (distance <= 1) & (samples.std(axis=1) <= self.stds[shades] + empty_std_tolerance)
+        return empty, 1.0 - 0.5 * np.minimum(distance, 1.0)
+
+def board_to_fen(state, prefix):
+    """Return the full FEN of a BoardState, with the active color taken from the prefix."""
+    state.set_turn(prefix == 'white_')
+
+    # A single frame cannot show en passant targets or move clocks; MoveTracker recovers
+    # them by following the game move by move. Castling follows from the placement
+    return state.fen()
+
+class FolderSink:
+    """Debug sink that dumps squares to the parser and photos folders like the old script did."""
+    def __init__(self, photo_folder=photo_folder, parser_folder=parser_folder):
+        self.folders = {
+            'corner': photo_folder,
+            'square': parser_folder,
+            'piece': photo_folder,
+        }
+
+    def __call__(self, kind, name, image):
+        filename = os.path.join(self.folders[kind], f'{name}.png')
+        cv2.imwrite(filename, image)
+        if kind == 'piece':
+            print(f"Saved: {filename}")
+
+class RecognitionResult:
+    def __init__(self, fen, prefix, squares, confidences, state):
+        self.fen = fen  # Full FEN string
+        self.prefix = prefix  # "black_", "white_" or "whoareyou_"
+        self.squares = squares  # Notation -> detected piece template name ('' when empty)
+        self.confidences = confidences  # Notation -> confidence of that label (0 to 1)
+        self.state = state  # BoardState of the position
+
+    @property
+    def key(self):
+        """Zobrist key of the position; equal keys mean the same placement and side to move."""
+        return self.state.key
+
+class BoardRecognizer:
+    """Recognize a chessboard from an in-memory BGR image without touching the disk."""
+    def __init__(self, template_folders=(template_folder, piece_template_folder), debug_sink=None, batch=False, skip_empty=True,
+                 square_size=canonical_square_size, bundle=None):
+        # Load the templates and build the matcher once; boards are resampled to square_size
+        # pixels per square so the cost per square does not depend on the capture resolution.
+        # A TemplateBundle (see template_bundle.py) replaces the folders and brings every
+        # feature precomputed
+        self.square_size = square_size
+        if bundle is not None:
+            bundle.check(square_size, template_scales, batch_square_size, orb_settings)
+            self.templates = bundle.templates
+        else:
+            self.templates = load_templates(template_folders)
+        self.piece_names = piece_names(self.templates)
+        self.matcher = OrbMatcher(self.templates, self.piece_names, square_size,
+                                  features=bundle.orb_features if bundle is not None else None)
+
+        # Batch mode scores all squares in one shot instead of ORB matching each square
+        self.batch = batch
+        self.batch_classifier = BatchClassifier({name: self.templates[name] for name in self.piece_names},
+                                                features=bundle.batch_features if bundle is not None else None)
+
+        # Squares that look like an empty square of the calibrated theme skip classification
+        self.skip_empty = skip_empty
+        self.theme = None
+
+        # Optional callable(kind, name, image) that receives debug images
+        self.debug_sink = debug_sink
+
+    def dump(self, kind, name, image):
+        if self.debug_sink is not None:
+            self.debug_sink(kind, name, image)
+
+    # Determine the prefix based on ORB matching with special factor
+    def determine_prefix(self, image):
+        descriptors = self.matcher.compute(image)
+        if self.matcher.match(descriptors, 'black', special_factor):
+            return "black_"
+        elif self.matcher.match(descriptors, 'white', special_factor):
+            return "white_"
+        else:
+            return "whoareyou_"
+
+    def detect_piece(self, square):
+        """Return (name, confidence) of the piece template matching the square, '' if none does."""
+        # Extract the square's descriptors once and score them against every piece template
+        return self.matcher.classify(self.matcher.compute(square))
+
+    def corner(self, image):
+        """Return the top-left 1/3.6 by 1/3.6 part of the a1 square (bottom-left)."""
+        square_height = image.shape[0] // 8
+        square_width = image.shape[1] // 8
+        a1_y_start = 7 * square_height
+        return image[a1_y_start:a1_y_start + int(square_height // 3.6), 0:int(square_width // 3.6)]
+
+    def calibrate(self, gray):
+        """Learn the square theme from a grayscale board; kept until reset_theme()."""
+        theme = SquareTheme(gray)
+        self.theme = theme if theme.valid else None
+        return self.theme
+
+    def reset_theme(self):
+        self.theme = None
+
+    def share(self):
+        """Return a recognizer that reuses this one's templates and matchers but calibrates its own theme."""
+        shared = copy.copy(self)
+        shared.theme = None
+        return shared
+
+    def classify(self, image, gray, indices=range(64)):
+        """Return (pieces, confidences) lists for the given squares (0 is a8, 63 is h1)."""
+        indices = np.asarray(indices, dtype=int)
+        if len(indices) == 0:
+            return [], []
+        if not self.skip_empty or (self.theme is None and self.calibrate(gray) is None):
+            return self.classify_squares(image, gray, indices)
+
+        # Only squares that do not look empty go through feature matching
+        empty, empty_confidences = self.theme.empty_squares(gray, indices)
+        metrics.count('squares_skipped_empty', int(empty.sum()))
+        pieces = [''] * len(indices)
+        confidences = empty_confidences.tolist()
+        occupied = np.flatnonzero(~empty)
+        for position, piece, confidence in zip(occupied, *self.classify_squares(image, gray, indices[occupied])):
+            pieces[position] = piece
+            confidences[position] = confidence
+        return pieces, confidences
+
+    def classify_squares(self, image, gray, indices):
+        if len(indices) == 0:
+            return [], []
+
+        if self.batch:
+            # Classify every requested square in one shot
+            if len(indices) == 64:
+                stack = self.batch_classifier.normalize_board(gray)
+            else:
+                stack = self.batch_classifier.normalize_squares(gray, indices)
+            labels, confidences = self.batch_classifier.classify(stack)
+            return [self.batch_classifier.names[label] if label >= 0 else '' for label in labels], confidences.tolist()
+
+        # Detect pieces square by square using ORB
+        tiles = board_tiles(image)
+        detected = [self.detect_piece(tiles[index // 8, index % 8]) for index in indices]
+        return [piece for piece, _ in detected], [confidence for _, confidence in detected]
+
+    def build_result(self, image, prefix, pieces, confidences, state=None):
+        """Assemble the RecognitionResult from 64 piece names (rank 8 first).
+
+        Callers that keep a BoardState of the pieces up to date pass it as state.
+        """
+        if state is None:
+            state = BoardState([piece_code(piece) for piece in pieces])
+
+        if self.debug_sink is not None:
+            # Zero-copy view of the 64 squares, rank 8 first
+            tiles = board_tiles(image)
+            for index, notation in enumerate(square_names):
+                self.dump('square', f'{prefix}{notation}', tiles[index // 8, index % 8])
+                if pieces[index]:
+                    self.dump('piece', f'{notation}_{pieces[index]}', tiles[index // 8, index % 8])
+
+        squares = dict(zip(square_names, pieces))
+        square_confidences = dict(zip(square_names, confidences))
+        return RecognitionResult(board_to_fen(state, prefix), prefix, squares, square_confidences, state)
+
+    def normalize(self, image):
+        """Resample a board image to the canonical square size."""
+        with metrics.timer('normalize'):
+            return normalize_board(image, self.square_size)
+
+    def recognize(self, image):
+        """Return the RecognitionResult for a BGR image that contains exactly the board."""
+        image = self.normalize(image)
+        top_left_a1 = self.corner(image)
+        self.dump('corner', 'black-or-white', top_left_a1)
+
+        # Determine the prefix (and therefore active color) for the game
+        with metrics.timer('prefix'):
+            prefix = self.determine_prefix(cv2.cvtColor(top_left_a1, cv2.COLOR_BGR2GRAY))
+
+        with metrics.timer('classification'):
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            pieces, confidences = self.classify(image, gray)
+        metrics.count('squares_classified', 64)
+
+        with metrics.timer('fen'):
+            return self.build_result(image, prefix, pieces, confidences)
+
+class IncrementalRecognizer:
+    """Stateful recognizer that only re-classifies squares that changed since the previous frame."""
+    def __init__(self, recognizer, threshold=fingerprint_threshold):
+        self.recognizer = recognizer  # Shared BoardRecognizer (templates are loaded once there)
+        self.threshold = threshold
+        self.fingerprints = None
+        self.pieces = None
+        self.confidences = None
+        self.prefix = None
+        self.state = BoardState()  # Kept in step with self.pieces, key updated per changed square
+        self.shape = None
+        self.evaluated = 0  # Number of squares re-classified for the last frame
+
+    def reset(self):
+        self.fingerprints = None
+        self.pieces = None
+        self.confidences = None
+        self.prefix = None
+        self.state = BoardState()
+        self.recognizer.reset_theme()
+
+    def fingerprint(self, gray):
+        """Return a (64, n, n) downsampled fingerprint of every square."""
+        square_height = gray.shape[0] // 8
+        square_width = gray.shape[1] // 8
+        size = 8 * fingerprint_size
+        small = cv2.resize(gray[:8 * square_height, :8 * square_width], (size, size), interpolation=cv2.INTER_AREA)
+        return board_tiles(small).reshape(64, fingerprint_size, fingerprint_size).astype(np.int16)
+
+    def changed_squares(self, fingerprints):
+        """Return the indices of the squares whose fingerprint moved past the threshold."""
+        if self.fingerprints is None:
+            return np.arange(64)
+        difference = np.abs(fingerprints - self.fingerprints).max(axis=(1, 2))
+        return np.flatnonzero(difference > self.threshold)
+
+    def recognize(self, image):
+        """Return the RecognitionResult for a board image, reusing cached labels where possible."""
+        # Start over when the board size changes between frames
+        if self.shape != image.shape[:2]:
+            self.reset()
+        self.shape = image.shape[:2]
+
+        image = self.recognizer.normalize(image)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        fingerprints = self.fingerprint(gray)
+
+        changed = self.changed_squares(fingerprints)
+        self.evaluated = len(changed)
+        metrics.count('squares_classified', self.evaluated)
+        metrics.count('squares_reused', 64 - self.evaluated)
+
+        if self.pieces is None:
+            self.pieces = [''] * 64
+            self.confidences = [0.0] * 64
+
+        # The active color is read from the a1 corner (index 56), only redo it when a1 changed
+        if self.prefix is None or 56 in changed:
+            with metrics.timer('prefix'):
+                self.prefix = self.recognizer.determine_prefix(cv2.cvtColor(self.recognizer.corner(image), cv2.COLOR_BGR2GRAY))
+
+        with metrics.timer('classification'):
+            pieces, confidences = self.recognizer.classify(image, gray, changed)
+        for index, piece, confidence in zip(changed, pieces, confidences):
+            self.pieces[index] = piece
+            self.confidences[index] = confidence
+        self.state.update(changed, [piece_code(piece) for piece in pieces])
+
+        # Only remember the fingerprints of squares that were re-evaluated, so slow
+        # drifts still add up until they cross the threshold
+        if self.fingerprints is None:
+            self.fingerprints = fingerprints
+        else:
+            self.fingerprints[changed] = fingerprints[changed]
 
-    # Sort matches by distance (best matches first)
-    matches = sorted(matches, key=lambda x: x.distance)
+        with metrics.timer('fen'):
+            # Results keep their own copy; self.state changes with the next frame
+            return self.recognizer.build_result(image, self.prefix, self.pieces, self.confidences, self.state.copy())
 
-    # Return True if we have enough good matches
-    return len(matches) > min_matches
+if __name__ == '__main__':
+    # Clear all PNG files from the photos and parser folders before processing
+    if not os.path.exists(photo_folder):
+        os.makedirs(photo_folder)
 
-# Function to use ORB for special image recognition (with the factor applied)
-def special_orb_match(image, template, factor):
-    return orb_feature_match(image, template, min_matches=factor)
+    if not os.path.exists(parser_folder):
+        os.makedirs(parser_folder)
 
-# Get the dimensions of the chessboard image
-height, width, _ = image.shape
+    clear_photos_and_parser_folders(photo_folder, parser_folder)
 
-# Define the size of each square (assuming 8x8 board)
-square_height = height // 8
-square_width = width // 8
+    # Load the chessboard image
+    image_path = 'template.png'  # Path to your main chessboard image
+    image = cv2.imread(image_path)
 
-# Standard and reversed chess notation for rows and columns
-standard_columns = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
-standard_rows = ['1', '2', '3', '4', '5', '6', '7', '8']
-reversed_columns = ['h', 'g', 'f', 'e', 'd', 'c', 'b', 'a']
-reversed_rows = ['8', '7', '6', '5', '4', '3', '2', '1']
+    # Ensure the image is loaded
+    if image is None:
+        raise ValueError(f"Could not load the chessboard image at {image_path}")
 
-# Prepare an 8x8 board for FEN notation (initially empty)
-board_fen = [['' for _ in range(8)] for _ in range(8)]
-
-# Extract the top-left 1/3.6 by 1/3.6 of the a1 square and save it as black-or-white.png
-a1_x_start = 0 * square_width
-a1_y_start = 7 * square_height  # Reverse for 'a1' (bottom-left)
-a1_square = image[a1_y_start:a1_y_start + square_height, a1_x_start:a1_x_start + square_width]
-
-# Extract the top-left 1/3.6 by 1/3.6 part of the a1 square
-top_left_a1 = a1_square[0:int(square_height // 3.6), 0:int(square_width // 3.6)]
-
-# Save the top-left portion of a1 as 'black-or-white.png'
-cv2.imwrite(os.path.join(photo_folder, 'black-or-white.png'), top_left_a1)
-
-# Load the saved 'black-or-white.png' image for matching
-black_or_white_img = cv2.imread(os.path.join(photo_folder, 'black-or-white.png'), cv2.IMREAD_GRAYSCALE)
-
-# Function to check for pawn using ORB matching on template
-def detect_pawn(square, pawn_template):
-    return orb_feature_match(square, pawn_template)
-
-# Determine the prefix based on ORB matching with special factor
-def determine_prefix(image, white_template, black_template):
-    if special_orb_match(image, black_template, special_factor):
-        return "black_"
-    elif special_orb_match(image, white_template, special_factor):
-        return "white_"
-    else:
-        return "whoareyou_"
-
-# Load black and white templates for determining active color
-black_template = cv2.imread(os.path.join(template_folder, 'black.png'), cv2.IMREAD_GRAYSCALE)
-white_template = cv2.imread(os.path.join(template_folder, 'white.png'), cv2.IMREAD_GRAYSCALE)
-
-# Determine the prefix (and therefore active color) for the game
-prefix = determine_prefix(black_or_white_img, white_template, black_template)
-
-# Loop through each square, extract it, and detect pawns using ORB
-for row in range(8):
-    for col in range(8):
-        # Coordinates of the current square
-        x_start = col * square_width
-        y_start = (7 - row) * square_height  # Reverse order for rows (a1 is bottom left)
-        x_end = x_start + square_width
-        y_end = y_start + square_height
-        
-        # Extract the square from the chessboard image
-        square = image[y_start:y_end, x_start:x_end]
-
-        # Get the notation for the current square
-        notation = standard_columns[col] + standard_rows[row]
-
-        # Save the raw image in the 'parser' folder with the appropriate prefix and notation
-        raw_image_filename = f'{parser_folder}/{prefix}{notation}.png'
-        cv2.imwrite(raw_image_filename, square)
-
-        # Perform ORB-based template matching for all pawn types
-        piece = ''
-        if detect_pawn(square, black_pawn_dark):
-            piece = 'black_pawn_dark'
-        elif detect_pawn(square, black_pawn_light):
-            piece = 'black_pawn_light'
-        elif detect_pawn(square, white_pawn_dark):
-            piece = 'white_pawn_dark'
-        elif detect_pawn(square, white_pawn_light):
-            piece = 'white_pawn_light'
-
-        # Only save files in the 'photos' folder if a pawn is detected
-        if piece:
-            # Determine chess notation and FEN character for pawns
-            if piece.startswith('black'):
-                board_fen[7-row][col] = 'p'  # Black pawn (lowercase 'p')
-            elif piece.startswith('white'):
-                board_fen[7-row][col] = 'P'  # White pawn (uppercase 'P')
-
-            # Create the filename for the current square based on chess notation
-            square_filename = f'{photo_folder}/{notation}_{piece}.png'
-
-            # Save the square as an image file (in the same color depth as the input)
-            cv2.imwrite(square_filename, square)
-
-            # Optional: print confirmation
-            print(f"Saved: {square_filename}")
-
-# Convert the FEN board representation to a proper FEN string
-fen_rows = []
-for row in board_fen:
-    fen_row = ''
-    empty_count = 0
-    for cell in row:
-        if cell == '':
-            empty_count += 1
-        else:
-            if empty_count > 0:
-                fen_row += str(empty_count)
-                empty_count = 0
-            fen_row += cell
-    if empty_count > 0:
-        fen_row += str(empty_count)
-    fen_rows.append(fen_row)
-
-# Join the FEN rows to create the final FEN string
-fen_string = '/'.join(fen_rows)
-
-# Determine active color based on prefix
-active_color = 'w' if prefix == 'white_' else 'b'
-
-# Add the rest of the FEN components: active color, castling rights, en passant target, halfmove clock, fullmove number
-castling_rights = 'KQkq'  # Assuming both sides have castling rights
-en_passant = '-'  # No en passant target square
-halfmove_clock = '0'  # Halfmove clock is reset to 0
-fullmove_number = '1'  # Assuming it's the first move of the game
-
-final_fen = f"{fen_string} {active_color} {castling_rights} {en_passant} {halfmove_clock} {fullmove_number}"
-print(f"\nFEN Notation: {final_fen}")
+    recognizer = BoardRecognizer(debug_sink=FolderSink())
+    result = recognizer.recognize(image)
+    print(f"\nFEN Notation: {result.fen}")
@@ -1,19 +1,22 @@
 import sys
-import os
-import cv2
-import numpy as np
 import time
+import numpy as np
 import chess
-import chess.svg
 from PyQt5.QtWidgets import QApplication, QWidget, QPushButton, QVBoxLayout, QLabel, QHBoxLayout, QGraphicsView, QGraphicsScene, QMessageBox
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QImage
 from PyQt5.QtCore import Qt, QRect, QTimer, pyqtSignal
-from PyQt5.QtSvg import QGraphicsSvgItem, QSvgRenderer
 import win32gui
 import win32ui
 import win32con
 import win32api
-from stockfish import Stockfish
+from readchess import BoardRecognizer
+from engine_worker import EngineWorker, search_time
+from analysis_cache import AnalysisCache
+from board_renderer import BoardRenderer
+from move_tracker import MoveTracker
+from metrics import metrics
+from position_stabilizer import PositionStabilizer
+from frame_recorder import FrameRecorder
 
 class ScreenCapture(QWidget):
     def __init__(self):
@@ -27,7 +30,12 @@ class ScreenCapture(QWidget):
         self.screenshot_timer = QTimer()
         self.screenshot_timer.timeout.connect(self.capture_screen)
         self.capture_enabled = False
+        self.last_frame = None  # Most recent captured frame (BGR array)
+        self.recognizer = BoardRecognizer()  # Templates are loaded once here
+        self.stabilizer = PositionStabilizer()  # Holds back positions until they stop changing
+        self.recorder = None  # FrameRecorder while recording is switched on
         self.initUI()
+        self.tracker = MoveTracker(self.chess_board.board)  # Follows the game on the shown board
 
     def initUI(self):
         self.play_button = QPushButton('Play', self)
@@ -51,9 +59,15 @@ class ScreenCapture(QWidget):
         self.reset_board_button = QPushButton('Reset Board from Image', self)
         self.reset_board_button.clicked.connect(self.reset_board_from_image)
 
+        self.record_button = QPushButton('Record Frames', self)
+        self.record_button.setCheckable(True)
+        self.record_button.toggled.connect(self.toggle_recording)
+
         self.toggle_computer_button = QPushButton('Toggle Computer Color', self)
         self.toggle_computer_button.clicked.connect(self.toggle_computer_color)
         self.computer_color_label = QLabel('Computer is playing as White', self)
+        self.analysis_label = QLabel('Engine: -', self)
+        self.chess_board.engine.analysis_progress.connect(self.update_analysis_label)
 
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.play_button)
@@ -68,8 +82,10 @@ class ScreenCapture(QWidget):
         layout.addWidget(self.selected_area_label)
         layout.addWidget(self.entire_area_label)
         layout.addWidget(self.reset_board_button)
+        layout.addWidget(self.record_button)
         layout.addWidget(self.toggle_computer_button)
         layout.addWidget(self.computer_color_label)
+        layout.addWidget(self.analysis_label)
 
         board_layout = QHBoxLayout()
         board_layout.addWidget(self.chess_board)
@@ -99,6 +115,7 @@ class ScreenCapture(QWidget):
             y1 = int(self.rect.top())
             width = int(self.rect.width())
             height = int(self.rect.height())
+            start = time.perf_counter()
 
             hwin = win32gui.GetDesktopWindow()
             hwindc = win32gui.GetWindowDC(hwin)
@@ -112,23 +129,29 @@ class ScreenCapture(QWidget):
             bmp_info = bmp.GetInfo()
             bmp_str = bmp.GetBitmapBits(True)
 
-            img = np.frombuffer(bmp_str, dtype='uint8')
-            img.shape = (bmp_info['bmHeight'], bmp_info['bmWidth'], 4)
-            img = cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+            # View the bitmap bits as a BGRA array without copying them
+            bgra = np.frombuffer(bmp_str, dtype='uint8')
+            bgra.shape = (bmp_info['bmHeight'], bmp_info['bmWidth'], 4)
 
             win32gui.DeleteObject(bmp.GetHandle())
             memdc.DeleteDC()
             srcdc.DeleteDC()
             win32gui.ReleaseDC(hwin, hwindc)
+            metrics.observe('capture', time.perf_counter() - start)
+            metrics.count('frames_captured')
 
-            timestamp = int(time.time())
-            screenshot_path = f'screenshot_{timestamp}.png'
-            cv2.imwrite(screenshot_path, img)
+            self.update_screenshot_label(bgra)
 
-            self.update_screenshot_label(screenshot_path)
-    
-    def update_screenshot_label(self, path):
-        pixmap = QPixmap(path)
+            # Keep a BGR view of the frame for the recognizer
+            self.last_frame = bgra[..., :3]
+            self.follow_board(self.last_frame)
+            return self.last_frame
+
+    def update_screenshot_label(self, bgra):
+        # BGRA bytes are Qt's RGB32 layout, so the preview reads the captured buffer directly
+        height, width = bgra.shape[:2]
+        image = QImage(bgra.data, width, height, bgra.strides[0], QImage.Format_RGB32)
+        pixmap = QPixmap.fromImage(image)
         self.screenshot_label.setPixmap(pixmap.scaled(self.screenshot_label.size(), Qt.KeepAspectRatio))
 
     def set_capture_region(self, rect):
@@ -157,21 +180,47 @@ class ScreenCapture(QWidget):
         pos = win32api.GetCursorPos()
         self.mouse_up_label.setText(f'Mouse Up Coordinates (Win32): ({pos[0]}, {pos[1]})')
 
+    def follow_board(self, frame):
+        # Only positions that held across several frames reach the board and the engine,
+        # so a piece mid-drag or an animation never starts a search
+        recognized = self.recognizer.recognize(frame)
+        if self.recorder is not None:
+            # Queued for the recorder's writer thread; never waits on disk
+            self.recorder.record(frame, fen=recognized.fen)
+        result = self.stabilizer.push(recognized)
+        if result is not None:
+            self.apply_position(result.fen)
+
     def reset_board_from_image(self):
-        # Assume the screenshot has been saved and use it to update the board
-        latest_screenshot = max([f for f in os.listdir('.') if f.startswith('screenshot_')], key=os.path.getctime)
-        img = cv2.imread(latest_screenshot)
-        board_fen = self.read_board_from_image(img)
+        # Use the most recent captured frame to update the board right away
+        if self.last_frame is None:
+            return
+        board_fen = self.read_board_from_image(self.last_frame)
         if board_fen:
-            self.chess_board.board.set_fen(board_fen)
+            self.apply_position(board_fen)
+
+    def apply_position(self, board_fen):
+        # Push the move(s) that explain the new position so history, castling and en
+        # passant stay intact; fall back to a reset when none do
+        moves = self.tracker.update(board_fen)
+        if moves is None:
+            self.label.setText('Board reset from image')
+        elif moves:
+            self.label.setText('Moves from image: ' + ' '.join(move.uci() for move in moves))
+        if moves != []:
             self.chess_board.update_board()
+            self.chess_board.make_ai_move()
 
     def read_board_from_image(self, img):
         # Use image processing to recognize the chess board and convert it to FEN
-        # This is a placeholder for actual chess board recognition logic
-        # You need to implement the actual board recognition here
-        # For now, let's assume it returns a valid FEN string for the initial position
-        return chess.Board().fen()
+        return self.recognizer.recognize(img).fen
+
+    def toggle_recording(self, enabled):
+        if enabled:
+            self.recorder = FrameRecorder()
+        elif self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
 
     def toggle_computer_color(self):
         self.chess_board.computer_is_white = not self.chess_board.computer_is_white
@@ -179,8 +228,21 @@ class ScreenCapture(QWidget):
             self.computer_color_label.setText('Computer is playing as White')
         else:
             self.computer_color_label.setText('Computer is playing as Black')
-        if self.chess_board.board.turn == (self.chess_board.computer_is_white):
-            self.chess_board.make_ai_move()
+        self.chess_board.make_ai_move()
+
+    def update_analysis_label(self, fen, analysis):
+        # Show the engine's current best line; it sharpens as deeper iterations complete
+        if fen != self.chess_board.board.fen() or not analysis.lines:
+            return
+        move, centipawns, mate = analysis.lines[0]
+        score = f'mate {mate}' if mate is not None else f'{centipawns / 100:+.2f}'
+        self.analysis_label.setText(f'Engine depth {analysis.depth}: {move} ({score})')
+
+    def closeEvent(self, event):
+        self.chess_board.engine.stop()
+        if self.recorder is not None:
+            self.recorder.close()
+        super().closeEvent(event)
 
 class Overlay(QWidget):
     def __init__(self, parent=None):
@@ -236,21 +298,22 @@ class ChessBoard(QGraphicsView):
         self.setScene(self.scene)
         self.setFixedSize(400, 400)
         self.setRenderHints(QPainter.Antialiasing | QPainter.SmoothPixmapTransform)
+        self.renderer = BoardRenderer(self.scene)
         self.update_board()
         self.selected_piece = None
         self.source_square = None
         self.setMouseTracking(True)
-        self.stockfish = Stockfish(path="./stockfish/stockfish-windows-x86-64-avx2.exe")  # Update with the actual path to Stockfish executable
-        self.stockfish.set_depth(15)
         self.computer_is_white = True
 
+        # Engine searches run on a worker thread; results come back as a signal
+        self.engine = EngineWorker(time_budget=search_time, cache=AnalysisCache())
+        self.engine.best_move_ready.connect(self.apply_ai_move)
+        self.engine.engine_failed.connect(lambda message: QMessageBox.warning(self, 'Engine', message))
+        self.engine.start()
+
     def update_board(self):
-        svg = chess.svg.board(self.board).encode("UTF-8")
-        svg_renderer = QSvgRenderer(svg)
-        svg_item = QGraphicsSvgItem()
-        svg_item.setSharedRenderer(svg_renderer)
-        self.scene.clear()
-        self.scene.addItem(svg_item)
+        # Only squares whose occupant changed are redrawn
+        self.renderer.render(self.board)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -280,9 +343,17 @@ class ChessBoard(QGraphicsView):
         return chess.square(col, row)
 
     def make_ai_move(self):
-        if self.board.turn == self.computer_is_white:
-            self.stockfish.set_fen_position(self.board.fen())
-            best_move = self.stockfish.get_best_move()
+        # Ask the engine for a move without blocking; any older search is superseded
+        # Recognized positions can be illegal (no kings, pawns on the back rank); engines
+        # may crash on those, so they are never searched
+        if self.board.turn == self.computer_is_white and self.board.is_valid():
+            self.engine.request(self.board)
+        else:
+            self.engine.cancel()
+
+    def apply_ai_move(self, fen, best_move):
+        # Ignore results for positions the board has already left
+        if fen == self.board.fen() and self.board.turn == self.computer_is_white:
             self.board.push(chess.Move.from_uci(best_move))
             self.update_board()
 
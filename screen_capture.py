@@ -1,17 +1,25 @@
-import cv2
+import threading
 import numpy as np
-import time
 import mss
-from PIL import Image
+from capture_sources import CaptureSource
+from metrics import metrics
 
 
-class ScreenCapture:
-    def __init__(self):
-        self.sct = mss.mss()  # MSS instance for capturing
+class ScreenCapture(CaptureSource):
+    def __init__(self, rect=None):
+        self.rect = rect  # Region captured by read(): (x1, y1, width, height)
+        self.local = threading.local()  # MSS handles are per thread
         self.monitors = self.sct.monitors  # List of all monitors
 
+    @property
+    def sct(self):
+        """MSS instance for capturing, created on first use in each thread."""
+        if not hasattr(self.local, 'sct'):
+            self.local.sct = mss.mss()
+        return self.local.sct
+
     def capture_screen(self, rect):
-        """Capture the selected screen area."""
+        """Capture the selected screen area as a BGR array viewing the grabbed buffer."""
         if rect:
             x1, y1, width, height = rect  # Use the selected region for capture
             monitor = self.get_monitor_from_position(x1, y1)  # Capture the correct monitor
@@ -25,19 +33,31 @@ class ScreenCapture:
             }
 
             # Capture the screenshot
-            screenshot = self.sct.grab(capture_area)
+            with metrics.timer('capture'):
+                screenshot = self.sct.grab(capture_area)
+            metrics.count('frames_captured')
+
+            # View the raw BGRA buffer as an array without copying it, and drop alpha
+            return np.asarray(screenshot)[..., :3]
 
-            # Convert the screenshot to a format OpenCV can work with
-            img = np.array(screenshot)
+    def read(self):
+        """Capture self.rect (None while no region is selected)."""
+        return self.capture_screen(self.rect)
 
-            # Convert from BGRA to BGR for OpenCV
-            img = img[..., :3]
+    def close(self):
+        if hasattr(self.local, 'sct'):
+            self.local.sct.close()
+            del self.local.sct
 
-            # Save the image
-            timestamp = int(time.time())
-            screenshot_path = f'screenshot_{timestamp}.png'
-            cv2.imwrite(screenshot_path, img)
-            return screenshot_path
+    def capture_monitor(self, monitor):
+        """Capture a whole monitor (an entry of self.monitors) as a BGR image."""
+        return np.asarray(self.sct.grab(monitor))[..., :3]
 
     def get_monitor_from_position(self, x, y):
         """Find the monitor that contains the coordinates (x, y)."""
+        for index, monitor in enumerate(self.monitors[1:], start=1):
+            if (monitor["left"] <= x < monitor["left"] + monitor["width"]
+                    and monitor["top"] <= y < monitor["top"] + monitor["height"]):
+                return dict(monitor, id=index)
+        # Fall back to the primary monitor
+        return dict(self.monitors[1], id=1)
@@ -0,0 +1,188 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import cv2
+import numpy as np
+from readchess import (BatchClassifier, OrbMatcher, load_templates, piece_names, template_folder, piece_template_folder,
+                       canonical_square_size, template_scales, batch_square_size, orb_settings)
+
+# Compiled themes live here as <theme>.tplb
+bundle_folder = 'bundles'
+bundle_extension = '.tplb'
+default_theme = 'default'
+
+# File layout: magic, header length (little-endian uint64), JSON header, then every array
+# at a 64-byte aligned offset from the first aligned byte after the header
+bundle_magic = b'CHESSTPL'
+bundle_version = 1
+bundle_alignment = 64
+
+
+def align(offset):
+    return -(-offset // bundle_alignment) * bundle_alignment
+
+
+def bundle_path(theme):
+    """Return the bundle file for a theme name, or the argument itself if it is a path."""
+    if os.sep in theme or theme.endswith(bundle_extension):
+        return theme
+    return os.path.join(bundle_folder, theme + bundle_extension)
+
+
+def write_bundle(path, arrays, metadata):
+    """Write named arrays and JSON metadata into one bundle file, atomically."""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = align(offset)
+        layout[name] = {'offset': offset, 'shape': list(array.shape), 'dtype': array.dtype.str}
+        offset += array.nbytes
+    header = json.dumps(dict(metadata, version=bundle_version, arrays=layout)).encode()
+    data_start = align(len(bundle_magic) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(bundle_magic)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(temporary, path)
+
+
+def build_bundle(theme=default_theme, folders=(template_folder, piece_template_folder), path=None):
+    """Compile the templates in the folders into a bundle for the theme and return its path."""
+    templates = load_templates(folders)
+    pieces = piece_names(templates)
+    matcher = OrbMatcher(templates, pieces)
+    batch = BatchClassifier({name: templates[name] for name in pieces})
+
+    arrays = {}
+    for name, template in templates.items():
+        arrays[f'pixels/{name}'] = template
+        keypoints, descriptors = matcher.keypoints[name], matcher.descriptors[name]
+        arrays[f'keypoints/{name}'] = keypoints if keypoints is not None else np.empty((0, 7), np.float32)
+        arrays[f'descriptors/{name}'] = descriptors if descriptors is not None else np.empty((0, 32), np.uint8)
+    arrays['batch/features'] = batch.template_features.astype(np.float32)
+
+    # Source files and their modification times, to tell when the bundle is out of date
+    sources = {}
+    for folder in folders:
+        for filename in sorted(os.listdir(folder)):
+            if filename.endswith('.png'):
+                sources[os.path.join(folder, filename)] = os.path.getmtime(os.path.join(folder, filename))
+
+    metadata = {
+        'theme': theme,
+        'created': time.time(),
+        'opencv': cv2.__version__,
+        'templates': list(templates),
+        'square_size': canonical_square_size,
+        'scales': list(template_scales),
+        'batch_square_size': batch_square_size,
+        'orb': orb_settings,
+        'sources': sources,
+    }
+    path = path or bundle_path(theme)
+    write_bundle(path, arrays, metadata)
+    return path
+
+
+class TemplateBundle:
+    """Read-only view of a compiled template bundle, memory-mapped instead of decoded.
+
+    Template pixels, ORB keypoints and descriptors, and batch classifier features are
+    array views into the mapped file; pass the bundle to BoardRecognizer(bundle=...).
+    """
+    def __init__(self, path):
+        self.path = path
+        self.data = np.memmap(path, dtype=np.uint8, mode='r')
+        if bytes(self.data[:len(bundle_magic)]) != bundle_magic:
+            raise ValueError(f"{path} is not a template bundle")
+        header_start = len(bundle_magic) + 8
+        header_length = struct.unpack('<Q', bytes(self.data[len(bundle_magic):header_start]))[0]
+        self.metadata = json.loads(bytes(self.data[header_start:header_start + header_length]))
+        if self.metadata.get('version') != bundle_version:
+            raise ValueError(f"{path} has bundle version {self.metadata.get('version')}, expected {bundle_version}; rebuild it")
+        self.data_start = align(header_start + header_length)
+
+        names = self.metadata['templates']
+        self.templates = {name: self.array(f'pixels/{name}') for name in names}
+        self.orb_features = {}
+        for name in names:
+            keypoints = self.array(f'keypoints/{name}')
+            descriptors = self.array(f'descriptors/{name}')
+            self.orb_features[name] = (keypoints, descriptors) if len(descriptors) else (None, None)
+        self.batch_features = self.array('batch/features')
+
+    @property
+    def theme(self):
+        return self.metadata['theme']
+
+    def array(self, name):
+        entry = self.metadata['arrays'][name]
+        dtype = np.dtype(entry['dtype'])
+        start = self.data_start + entry['offset']
+        size = int(np.prod(entry['shape'])) * dtype.itemsize
+        return self.data[start:start + size].view(dtype).reshape(entry['shape'])
+
+    def check(self, square_size, scales, batch_size, orb):
+        """Raise ValueError if the bundle was built for other recognizer settings."""
+        built = (self.metadata['square_size'], self.metadata['scales'], self.metadata['batch_square_size'], self.metadata.get('orb'))
+        if built != (square_size, list(scales), batch_size, dict(orb)):
+            raise ValueError(f"{self.path} was built for square size, scales, batch size and ORB settings {built}; rebuild it")
+
+    def stale(self):
+        """Return True if a source template changed or disappeared since the bundle was built."""
+        for source, mtime in self.metadata['sources'].items():
+            if not os.path.exists(source) or os.path.getmtime(source) != mtime:
+                return True
+        return False
+
+
+def open_bundle(theme=default_theme):
+    """Open the bundle of a theme (or a bundle file path)."""
+    return TemplateBundle(bundle_path(theme))
+
+
+def list_themes(folder=bundle_folder):
+    if not os.path.isdir(folder):
+        return []
+    return sorted(f[:-len(bundle_extension)] for f in os.listdir(folder) if f.endswith(bundle_extension))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile template folders into memory-mappable theme bundles.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="compile a theme")
+    build.add_argument('--theme', default=default_theme)
+    build.add_argument('--folders', nargs='+', default=[template_folder, piece_template_folder],
+                       help="template folders, the first one holding black.png and white.png")
+    build.add_argument('--output', help="bundle file (default: bundles/<theme>.tplb)")
+    commands.add_parser('list', help="list compiled themes")
+    info = commands.add_parser('info', help="describe a compiled theme")
+    info.add_argument('theme')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        path = build_bundle(args.theme, args.folders, args.output)
+        print(f"Built {path} ({os.path.getsize(path) / 1024:.0f} KiB) in {time.perf_counter() - start:.2f}s")
+    elif args.command == 'list':
+        for theme in list_themes():
+            print(theme)
+    else:
+        bundle = open_bundle(args.theme)
+        metadata = bundle.metadata
+        print(f"{bundle.path}: theme {metadata['theme']}, {len(metadata['templates'])} templates, "
+              f"square size {metadata['square_size']}, scales {metadata['scales']}, OpenCV {metadata['opencv']}"
+              f"{', out of date' if bundle.stale() else ''}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Minimal UCI engine for the engine worker tests; run it as a script.
+
+It searches one depth per --step seconds, reporting each depth with the first legal
+move as its line, until the depth limit, the movetime or a stop. Positions without
+both kings make it exit the way a crashing engine would.
+"""
+import argparse
+import sys
+import threading
+import time
+import chess
+
+
+def search(board, depth, movetime, step, stopped):
+    move = min(board.legal_moves, key=lambda move: move.uci()).uci()
+    start = time.monotonic()
+    completed = 0
+    while completed < depth and not stopped.wait(step):
+        if movetime is not None and time.monotonic() - start > movetime:
+            break
+        completed += 1
+        print(f'info depth {completed} multipv 1 score cp {completed} nodes {completed * 100} pv {move}', flush=True)
+    print(f'bestmove {move}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--step', type=float, default=0.0)
+    args = parser.parse_args()
+
+    board = chess.Board()
+    searcher = None
+    stopped = threading.Event()
+    for line in sys.stdin:
+        command = line.split()
+        if not command:
+            continue
+        if command[0] == 'uci':
+            print('id name stub\nuciok', flush=True)
+        elif command[0] == 'isready':
+            print('readyok', flush=True)
+        elif command[0] == 'position':
+            if command[1] == 'startpos':
+                board = chess.Board()
+            else:
+                board = chess.Board(' '.join(command[2:8]))
+            if 'moves' in command:
+                for move in command[command.index('moves') + 1:]:
+                    board.push_uci(move)
+        elif command[0] == 'go':
+            if board.king(chess.WHITE) is None or board.king(chess.BLACK) is None:
+                sys.exit(1)
+            depth = int(command[command.index('depth') + 1]) if 'depth' in command else 1000
+            movetime = int(command[command.index('movetime') + 1]) / 1000 if 'movetime' in command else None
+            stopped.clear()
+            searcher = threading.Thread(target=search, args=(board.copy(), depth, movetime, args.step, stopped))
+            searcher.start()
+        elif command[0] == 'stop':
+            stopped.set()
+            if searcher is not None:
+                searcher.join()
+        elif command[0] == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+import chess
+from analysis_cache import Analysis, AnalysisCache
+
+
+def test_deeper_analysis_replaces_shallower(tmp_path):
+    cache = AnalysisCache(tmp_path / 'cache.sqlite3')
+    board = chess.Board()
+    cache.put(board, Analysis(8, [('e2e4', 30, None)]))
+    assert cache.get(board, 10) is None
+
+    cache.put(board, Analysis(12, [('d2d4', 25, None)]))
+    analysis = cache.get(board, 10)
+    assert analysis.depth == 12 and analysis.best_move == 'd2d4'
+
+    # A shallower result never overwrites a deeper one
+    cache.put(board, Analysis(6, [('g1f3', 10, None)]))
+    assert cache.get(board, 1).best_move == 'd2d4'
+    cache.close()
+
+
+def test_analyses_persist_across_reopening(tmp_path):
+    path = tmp_path / 'cache.sqlite3'
+    board = chess.Board()
+    board.push_uci('e2e4')
+    cache = AnalysisCache(path)
+    cache.put(board, Analysis(14, [('e7e5', -20, None), ('c7c5', -25, None)]), multipv=2)
+    cache.put(board, Analysis(9, [('c7c5', -30, None)]))
+    cache.close()
+
+    cache = AnalysisCache(path)
+    analysis = cache.get(board, 14, multipv=2)
+    assert analysis.depth == 14
+    assert analysis.lines == [('e7e5', -20, None), ('c7c5', -25, None)]
+    assert cache.get(board, 9).best_move == 'c7c5'
+    assert cache.get(chess.Board(), 1) is None
+    cache.close()
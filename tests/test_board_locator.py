@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from board_locator import BoardLocator
+
+square = 100
+light, dark = (181, 217, 240), (99, 136, 181)
+
+
+def desktop(dx=0, dy=0):
+    """An 800 px board on a plain background, shifted by (dx, dy) from (300, 200)."""
+    frame = np.full((1200, 1400, 3), (48, 46, 43), np.uint8)
+    for row in range(8):
+        for col in range(8):
+            y, x = 200 + dy + row * square, 300 + dx + col * square
+            frame[y:y + square, x:x + square] = light if (row + col) % 2 == 0 else dark
+    return frame
+
+
+@pytest.fixture
+def locator():
+    locator = BoardLocator()
+    assert locator.locate(desktop()).roi == (300, 200, 800, 800)
+    return locator
+
+
+def test_unmoved_board_keeps_the_cached_grid(locator):
+    frame = desktop()
+    frame[600:700, 700:800] = (100, 200, 200)  # Move highlight
+    assert locator.verify(locator.geometry.crop(frame))
+    assert locator.verify(desktop(4, -4), locator.geometry)
+
+
+@pytest.mark.parametrize('shift', [(100, 0), (200, 0), (100, 100), (30, 30), (25, -25), (0, -200)])
+def test_moved_board_is_detected(locator, shift):
+    frame = desktop(*shift)
+    assert not locator.verify(locator.geometry.crop(frame))
+    assert not locator.verify(frame, locator.geometry)
@@ -0,0 +1,37 @@
+import chess
+import pytest
+from board_monitor import MultiBoardMonitor
+from readchess import BoardRecognizer
+
+
+@pytest.fixture(scope='module')
+def recognizer():
+    return BoardRecognizer(batch=True)
+
+
+def changed(board, fen, at):
+    board.fen = fen
+    board.changed_at = at
+
+
+def test_engine_follows_the_most_recent_change(recognizer):
+    monitor = MultiBoardMonitor(None, recognizer)
+    first, second = monitor.add('first', (0, 0, 800, 800)), monitor.add('second', (800, 0, 800, 800))
+    changed(first, chess.STARTING_FEN, 1.0)
+    changed(second, 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1', 2.0)
+
+    assert monitor.next_analysis() is second
+    assert monitor.next_analysis() is first
+    assert monitor.next_analysis() is None
+
+    # A new position on a board already searched puts it back in line
+    changed(first, 'rnbqkbnr/pppppppp/8/8/3P4/8/PPP1PPPP/RNBQKBNR b KQkq - 0 1', 3.0)
+    assert monitor.next_analysis() is first
+
+
+def test_positions_the_engine_cannot_search_are_skipped(recognizer):
+    monitor = MultiBoardMonitor(None, recognizer)
+    kingless, mated = monitor.add('kingless', (0, 0, 800, 800)), monitor.add('mated', (800, 0, 800, 800))
+    changed(kingless, '8/8/8/1r4p1/1r4p1/1R4P1/1RN3P1/8 b - - 0 1', 2.0)
+    changed(mated, 'rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3', 1.0)
+    assert monitor.next_analysis() is None
@@ -0,0 +1,30 @@
+import chess
+import pytest
+from board_renderer import BoardRenderer
+
+
+@pytest.fixture
+def renderer(qapp):
+    from PyQt5.QtWidgets import QGraphicsScene
+    return BoardRenderer(QGraphicsScene())
+
+
+def test_first_render_draws_every_piece(renderer):
+    board = chess.Board()
+    assert len(renderer.render(board)) == 32
+    assert renderer.render(board) == []
+
+
+def test_move_redraws_only_from_and_to_squares(renderer):
+    board = chess.Board()
+    renderer.render(board)
+    board.push_san('e4')
+    assert renderer.render(board) == [chess.E2, chess.E4]
+    assert renderer.updated == 2
+
+
+def test_castling_redraws_king_and_rook_squares(renderer):
+    board = chess.Board('r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1')
+    renderer.render(board)
+    board.push_san('O-O')
+    assert renderer.render(board) == [chess.E1, chess.F1, chess.G1, chess.H1]
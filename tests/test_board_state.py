@@ -0,0 +1,46 @@
+import random
+import chess
+import pytest
+from board_state import BoardState, piece_codes
+
+
+def squares_of(board):
+    """Return the 64 square codes of a chess.Board, a8 first."""
+    pieces = [board.piece_at(chess.square_mirror(index)) for index in range(64)]
+    return [piece_codes[piece.symbol()] if piece else 0 for piece in pieces]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_incremental_updates_match_fresh_states_over_random_games(seed):
+    rng = random.Random(seed)
+    board = chess.Board()
+    state = BoardState(squares_of(board))
+    for _ in range(120):
+        if board.is_game_over():
+            break
+        board.push(rng.choice(list(board.legal_moves)))
+
+        # Apply only the changed squares, alternating set() and update()
+        target = squares_of(board)
+        changed = [index for index in range(64) if state.squares[index] != target[index]]
+        if len(board.move_stack) % 2:
+            for index in changed:
+                state.set(index, target[index])
+        else:
+            state.update(changed, [target[index] for index in changed])
+        state.set_turn(board.turn == chess.WHITE)
+
+        fresh = BoardState(target, board.turn == chess.WHITE)
+        assert state.key == fresh.key == fresh.compute_key()
+        assert state == fresh
+        assert state.placement() == board.board_fen()
+        assert BoardState.from_fen(board.fen()) == fresh
+
+
+def test_side_to_move_changes_the_key():
+    white = BoardState.from_fen(chess.STARTING_FEN)
+    black = white.copy()
+    black.set_turn(False)
+    assert white.key != black.key
+    black.set_turn(True)
+    assert white.key == black.key
@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import chess
+import pytest
+from engine_worker import EngineWorker
+
+stub_engine = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stub_engine.py')
+
+after_e4 = chess.Board('rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1')
+
+
+def wait_for(qapp, condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        qapp.processEvents()
+        time.sleep(0.005)
+    return condition()
+
+
+@pytest.fixture
+def start_worker(qapp):
+    workers = []
+
+    def start(step=0.0, **options):
+        worker = EngineWorker(path=[sys.executable, stub_engine, '--step', str(step)], **options)
+        worker.moves, worker.progress, worker.failures = [], [], []
+        worker.best_move_ready.connect(lambda fen, move: worker.moves.append((fen, move, time.monotonic())))
+        worker.analysis_progress.connect(lambda fen, analysis: worker.progress.append((fen, analysis.depth)))
+        worker.engine_failed.connect(worker.failures.append)
+        worker.start()
+        workers.append(worker)
+        return worker
+
+    yield start
+    for worker in workers:
+        worker.stop()
+
+
+def test_engine_crash_is_reported_and_engine_restarted(qapp, start_worker):
+    worker = start_worker(depth=1)
+    worker.request(chess.Board('8/8/8/1r4p1/1r4p1/1RNNN1P1/1RNN2P1/8 w - - 0 1'))
+    assert wait_for(qapp, lambda: worker.failures)
+    assert worker.isRunning()
+
+    # The worker is still alive and searches with a fresh engine
+    worker.request(chess.Board())
+    assert wait_for(qapp, lambda: worker.moves)
+    assert [move for _, move, _ in worker.moves] == ['a2a3']
+
+
+def test_superseded_request_never_reports_a_move(qapp, start_worker):
+    worker = start_worker(step=0.02, depth=20)
+    worker.request(chess.Board())
+    assert wait_for(qapp, lambda: worker.progress)
+
+    # A newer position arrives while the first search is running
+    worker.request(after_e4)
+    assert wait_for(qapp, lambda: worker.moves)
+    wait_for(qapp, lambda: False, timeout=0.2)
+    assert [fen for fen, _, _ in worker.moves] == [after_e4.fen()]
+
+
+def test_cancel_stops_the_search_in_progress(qapp, start_worker):
+    worker = start_worker(step=0.05, depth=40)
+    worker.request(chess.Board())
+    assert wait_for(qapp, lambda: worker.progress)
+    worker.cancel()
+
+    # The search ends long before its 2 s of depths and never reports a move
+    assert wait_for(qapp, lambda: worker.search is None, timeout=0.5)
+    wait_for(qapp, lambda: False, timeout=0.2)
+    assert worker.moves == []
+    assert len(worker.progress) < 10
+
+
+def test_every_completed_depth_is_streamed(qapp, start_worker):
+    worker = start_worker(step=0.02, depth=6)
+    worker.request(chess.Board())
+    assert wait_for(qapp, lambda: worker.moves)
+    assert worker.progress == [(chess.STARTING_FEN, depth) for depth in range(1, 7)]
+
+
+def test_search_stops_at_the_time_budget(qapp, start_worker):
+    budget = 0.3
+    worker = start_worker(step=0.05, depth=None, time_budget=budget)
+    start = time.monotonic()
+    worker.request(chess.Board())
+    assert wait_for(qapp, lambda: worker.moves)
+
+    # Depths keep streaming until the budget runs out, then the best move follows at once
+    elapsed = worker.moves[0][2] - start
+    assert budget <= elapsed < budget + 0.25
+    depths = [depth for _, depth in worker.progress]
+    assert depths == list(range(1, len(depths) + 1))
+    assert len(depths) >= 3
@@ -0,0 +1,56 @@
+import chess
+from move_tracker import MoveTracker
+
+
+def placement_after(board, *sans):
+    """Return the FEN a recognizer would read after the moves: placement and side to move only."""
+    board = board.copy()
+    for san in sans:
+        board.push_san(san)
+    return f"{board.board_fen()} {'w' if board.turn else 'b'} - - 0 1"
+
+
+def test_unchanged_placement_pushes_nothing():
+    tracker = MoveTracker()
+    assert tracker.update(chess.STARTING_FEN) == []
+    assert tracker.board.move_stack == []
+
+
+def test_two_plies_missed_between_frames_are_replayed():
+    tracker = MoveTracker()
+    moves = tracker.update(placement_after(tracker.board, 'e4', 'e5'))
+    assert [move.uci() for move in moves] == ['e2e4', 'e7e5']
+    assert tracker.board.fen() == 'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2'
+
+
+def test_castling_keeps_the_remaining_rights():
+    board = chess.Board('r3k2r/pppppppp/8/8/8/8/PPPPPPPP/R3K2R w KQkq - 0 1')
+    tracker = MoveTracker(board)
+    moves = tracker.update(placement_after(board, 'O-O'))
+    assert [move.uci() for move in moves] == ['e1g1']
+    assert tracker.board.castling_xfen() == 'kq'
+    assert tracker.resets == 0
+
+
+def test_en_passant_capture_is_recognized():
+    tracker = MoveTracker()
+    tracker.update(placement_after(tracker.board, 'e4', 'a6'))
+    tracker.update(placement_after(tracker.board, 'e5', 'd5'))
+    assert tracker.board.ep_square == chess.D6
+
+    # The captured pawn vanishes from d5, which only the en passant move explains
+    moves = tracker.update(placement_after(tracker.board, 'exd6'))
+    assert [move.uci() for move in moves] == ['e5d6']
+    assert tracker.board.piece_at(chess.D5) is None
+    assert len(tracker.board.move_stack) == 5
+    assert tracker.resets == 0
+
+
+def test_unexplained_placement_falls_back_to_a_reset():
+    tracker = MoveTracker()
+    tracker.update(placement_after(tracker.board, 'e4'))
+    fen = '8/8/8/1r4p1/1r4p1/1R4P1/1RN3P1/8 b - - 0 1'
+    assert tracker.update(fen) is None
+    assert tracker.resets == 1
+    assert tracker.board.fen() == fen
+    assert tracker.board.move_stack == []
@@ -0,0 +1,23 @@
+import cv2
+import pytest
+from position_stabilizer import PositionStabilizer
+from readchess import BoardRecognizer
+
+
+@pytest.mark.parametrize('batch', [False, True], ids=['orb', 'batch'])
+def test_repeated_reading_of_a_real_board_is_published_once(batch):
+    recognizer = BoardRecognizer(batch=batch)
+    image = cv2.imread('template.png')
+    stabilizer = PositionStabilizer()
+    published = [stabilizer.push(recognizer.recognize(image), timestamp=index * 0.1) for index in range(5)]
+    assert [result is not None for result in published] == [False, False, True, False, False]
+
+
+def test_changed_position_restarts_the_count():
+    recognizer = BoardRecognizer(batch=True)
+    image = cv2.imread('template.png')
+    flipped = cv2.flip(image, -1)
+    stabilizer = PositionStabilizer()
+    frames = [image, image, flipped, flipped, flipped]
+    published = [stabilizer.push(recognizer.recognize(frame), timestamp=index * 0.1) for index, frame in enumerate(frames)]
+    assert [result is not None for result in published] == [False, False, False, False, True]
@@ -0,0 +1,33 @@
+import cv2
+import pytest
+from readchess import BoardRecognizer
+
+template_image = 'template.png'
+scales = (0.5, 0.75, 1.0, 1.5, 2.0, 3.0)
+
+# Pieces of template.png that have a template to match; bishops, queens, kings, black
+# knights and the knight on a dark square have none and are expected to read empty
+expected = {'b5': 'r', 'g5': 'p', 'b4': 'r', 'g4': 'p', 'b3': 'R', 'g3': 'P', 'b2': 'R', 'c2': 'N', 'g2': 'P'}
+
+
+@pytest.fixture(scope='module')
+def board():
+    image = cv2.imread(template_image)
+    assert image is not None
+    return image
+
+
+@pytest.mark.parametrize('batch', [False, True], ids=['orb', 'batch'])
+def test_capture_resolution_does_not_change_the_reading(board, batch):
+    recognizer = BoardRecognizer(batch=batch)
+    reference = recognizer.recognize(board).fen
+    for scale in scales:
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        scaled = cv2.resize(board, None, fx=scale, fy=scale, interpolation=interpolation)
+        assert BoardRecognizer(batch=batch).recognize(scaled).fen == reference, scale
+
+
+def test_orb_reads_every_templated_piece(board):
+    result = BoardRecognizer().recognize(board)
+    symbols = {square: result.state.symbol(index) for index, square in enumerate(result.squares)}
+    assert {square: symbol for square, symbol in symbols.items() if symbol} == expected
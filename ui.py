@@ -1,8 +1,21 @@
+import queue
+import time
 import tkinter as tk
+from tkinter import filedialog
+import cv2
 from PIL import ImageTk, Image
+import chess
+from PyQt5.QtCore import Qt
 from screen_capture import ScreenCapture
 from utils import MouseTracker
 from mouse_events import MouseEventsMixin
+from board_locator import BoardLocator
+from readchess import BoardRecognizer, IncrementalRecognizer
+from frame_producer import CaptureProducer, min_capture_fps, max_capture_fps
+from board_monitor import MultiBoardMonitor
+from engine_worker import EngineWorker, search_time
+from analysis_cache import AnalysisCache
+from metrics import metrics
 
 
 class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
@@ -15,15 +28,28 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.is_drawing = False
         self.rect = None
         self.screenshot_enabled = False
+        self.producer = None  # Background capture thread while capturing
+        self.fps = 15  # Last valid capture rate from the spinbox
+        self.metrics_panel = None  # Debug window showing pipeline timings while open
         self.sc = ScreenCapture()  # Instance of screen capture logic
+        self.locator = BoardLocator()  # Finds the board on screen and caches its geometry
+        self.recognizer = IncrementalRecognizer(BoardRecognizer(batch=True))  # Reads positions from frames
+        self.monitor = MultiBoardMonitor(self.sc, self.recognizer.recognizer)  # Extra boards share its templates
+        self.engine = None  # EngineWorker shared by the monitored boards, started with the first one
+        self.engine_results = queue.SimpleQueue()  # (FEN, best move) or (None, error) from the engine thread
+        self.analysing = None  # (board, FEN) the engine is searching
 
         self.active_monitor = "None"  # To track which monitor the user is capturing
         self.initUI()
         self.mouse_tracker = MouseTracker(self)  # Start tracking mouse
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
     def initUI(self):
         self.play_button = tk.Button(self, text="Play", command=self.start_capture)
         self.capture_button = tk.Button(self, text="Capture", command=self.start_capture_mode)
+        self.find_board_button = tk.Button(self, text="Find Board", command=self.find_board)
+        self.metrics_button = tk.Button(self, text="Metrics", command=self.toggle_metrics_panel)
+        self.add_board_button = tk.Button(self, text="Add Board", command=self.add_board)
         self.stop_button = tk.Button(self, text="Stop", command=self.stop_capture, state=tk.DISABLED)
         self.label = tk.Label(self, text="Select region and press Play")
         self.mouse_coords_label = tk.Label(self, text="Mouse Coordinates: (0, 0)")
@@ -31,9 +57,17 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.mouse_up_label = tk.Label(self, text="Mouse Up Coordinates: (0, 0)")
         self.screen_label = tk.Label(self, text="Screen: None")
         self.selected_area_label = tk.Label(self, text="Selected Area: (0, 0, 0, 0)")
+        self.fen_label = tk.Label(self, text="FEN: -")
+        self.boards_label = tk.Label(self, text="", justify=tk.LEFT)
+        self.fps_label = tk.Label(self, text="Capture FPS:")
+        self.fps_var = tk.IntVar(value=self.fps)
+        self.fps_spinbox = tk.Spinbox(self, from_=min_capture_fps, to=max_capture_fps, width=4, textvariable=self.fps_var)
 
         self.play_button.pack()
         self.capture_button.pack()
+        self.find_board_button.pack()
+        self.metrics_button.pack()
+        self.add_board_button.pack()
         self.stop_button.pack()
         self.label.pack()
         self.mouse_coords_label.pack()
@@ -41,6 +75,10 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.mouse_up_label.pack()
         self.screen_label.pack()  # Screen label shows active monitor
         self.selected_area_label.pack()
+        self.fen_label.pack()
+        self.boards_label.pack()
+        self.fps_label.pack()
+        self.fps_spinbox.pack()
 
         self.screenshot_label = tk.Label(self)
         self.screenshot_label.pack()
@@ -59,25 +97,119 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.stop_button.config(state=tk.NORMAL)
         self.screenshot_enabled = True
         self.label.config(text="Capturing... Press Stop to end.")
+
+        # Grab frames on a background thread so the window never stalls on a grab
+        self.sc.rect = self.rect
+        self.producer = CaptureProducer(self.grab_frame, fps=self.capture_fps())
+        self.producer.start()
         self.capture_loop()
 
+    def capture_fps(self):
+        # The spinbox holds whatever is being typed; keep the last valid rate until it parses
+        try:
+            self.fps = min(max(self.fps_var.get(), min_capture_fps), max_capture_fps)
+        except tk.TclError:
+            pass
+        return self.fps
+
+    def grab_frame(self):
+        # Runs on the producer thread; decided per grab, so boards added while capturing
+        # are picked up at once. With boards registered one grab per monitor serves them all
+        if self.monitor.boards:
+            return self.monitor.grab()
+        return self.sc.read()
+
     def stop_capture(self):
         self.play_button.config(state=tk.NORMAL)
         self.stop_button.config(state=tk.DISABLED)
         self.screenshot_enabled = False
+        if self.producer is not None:
+            self.producer.stop()
+            self.producer = None
         self.label.config(text="Capture stopped. Select region and press Play.")
 
     def capture_loop(self):
         if self.screenshot_enabled:
-            screenshot_path = self.sc.capture_screen(self.rect)
-            if screenshot_path:
-                self.update_screenshot_label(screenshot_path)
-            self.after(1000, self.capture_loop)  # Capture every 1 second
-
-    def update_screenshot_label(self, path):
-        img = Image.open(path)
-        img = img.resize((400, 400))
-        tk_img = ImageTk.PhotoImage(img)
+            # Pull the newest frame, if any, and tell the producer how long it took to handle
+            latest = self.producer.slot.take()
+            if latest is not None:
+                start = time.perf_counter()
+                self.process_frame(latest[0])
+                elapsed = time.perf_counter() - start
+                self.producer.report(elapsed)
+                metrics.observe('frame', elapsed)
+            self.producer.fps = self.capture_fps()
+
+            # Check for a new frame twice per capture interval
+            self.after(max(5, int(self.producer.interval() * 500)), self.capture_loop)
+
+    def process_frame(self, frame):
+        if isinstance(frame, dict):
+            self.process_boards(frame)
+            return
+
+        # Frames go straight from the capture buffer to the preview and the recognizer
+        with metrics.timer('preview'):
+            self.update_screenshot_label(frame)
+
+        # Re-locate the board if it moved away from the calibrated region
+        if self.locator.geometry is not None and not self.locator.verify(frame):
+            self.find_board()
+            return
+
+        result = self.recognizer.recognize(frame)
+        self.fen_label.config(text=f"FEN: {result.fen}")
+
+    def process_boards(self, frames):
+        # Recognize the registered boards, busiest first, and list their positions
+        self.monitor.process(frames)
+        self.schedule_analysis()
+        lines = [f"{board.name}: {board.fen or '-'}" + (f"  best {board.best_move}" if board.best_move else "")
+                 for board in self.monitor.boards.values()]
+        self.boards_label.config(text="\n".join(lines))
+
+    def start_engine(self):
+        self.engine = EngineWorker(time_budget=search_time, cache=AnalysisCache())
+        # No Qt event loop runs here: the slots run on the engine thread and only hand the
+        # results to the Tk thread through a queue
+        self.engine.best_move_ready.connect(lambda fen, move: self.engine_results.put((fen, move)), Qt.DirectConnection)
+        self.engine.engine_failed.connect(lambda message: self.engine_results.put((None, message)), Qt.DirectConnection)
+        self.engine.start()
+
+    def schedule_analysis(self):
+        # One engine serves every board: each search runs to its time budget, then the
+        # board that changed most recently and was not searched in its position goes next
+        while not self.engine_results.empty():
+            fen, move = self.engine_results.get()
+            if fen is None:
+                self.label.config(text=f"Engine: {move}")
+                self.analysing = None
+            elif self.analysing is not None and fen == self.analysing[1]:
+                self.analysing[0].best_move = move
+                self.analysing = None
+
+        if self.engine is None or not self.engine.isRunning() or self.analysing is not None:
+            return
+        board = self.monitor.next_analysis()
+        if board is not None:
+            position = chess.Board(board.fen)
+            self.analysing = (board, position.fen())
+            self.engine.request(position)
+
+    def add_board(self):
+        # Register the selected region as one more board to monitor
+        if not self.rect:
+            self.label.config(text="Select a board region first.")
+            return
+        name = f"Board {len(self.monitor.boards) + 1}"
+        self.monitor.add(name, self.rect)
+        if self.engine is None:
+            self.start_engine()
+        self.label.config(text=f"{name} added, monitoring {len(self.monitor.boards)} boards.")
+
+    def update_screenshot_label(self, frame):
+        preview = cv2.cvtColor(cv2.resize(frame, (400, 400)), cv2.COLOR_BGR2RGB)
+        tk_img = ImageTk.PhotoImage(Image.fromarray(preview))
         self.screenshot_label.config(image=tk_img)
         self.screenshot_label.image = tk_img  # Keep a reference to avoid garbage collection
 
@@ -86,6 +218,56 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.label.config(text="Screen capture mode enabled. Select the area.")
         self.dim_screens()
 
+    def find_board(self):
+        # Locate the board on the whole desktop and capture only its region from now on
+        monitor = self.sc.monitors[0]
+        geometry = self.locator.locate(self.sc.capture_monitor(monitor))
+        if geometry is None:
+            self.label.config(text="No board found on screen.")
+            return
+        self.rect = geometry.offset(monitor["left"], monitor["top"]).roi
+        self.sc.rect = self.rect
+        self.selected_area_label.config(text=f"Selected Area: {self.rect}")
+        self.label.config(text="Board found. Press Play to start capturing.")
+
+    def toggle_metrics_panel(self):
+        # Metrics are only collected while the panel is open
+        if self.metrics_panel is not None:
+            self.close_metrics_panel()
+            return
+        metrics.enabled = True
+        self.metrics_panel = tk.Toplevel(self)
+        self.metrics_panel.title("Pipeline Metrics")
+        self.metrics_panel.protocol("WM_DELETE_WINDOW", self.close_metrics_panel)
+        self.metrics_text = tk.Text(self.metrics_panel, width=70, height=24, font=("Courier", 9))
+        self.metrics_text.pack(fill="both", expand=True)
+        buttons = tk.Frame(self.metrics_panel)
+        buttons.pack()
+        tk.Button(buttons, text="Export JSON", command=lambda: self.export_metrics('json')).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Export Prometheus", command=lambda: self.export_metrics('prom')).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Reset", command=metrics.reset).pack(side=tk.LEFT)
+        self.refresh_metrics_panel()
+
+    def close_metrics_panel(self):
+        metrics.enabled = False
+        self.metrics_panel.destroy()
+        self.metrics_panel = None
+
+    def refresh_metrics_panel(self):
+        if self.metrics_panel is None:
+            return
+        self.metrics_text.delete("1.0", tk.END)
+        self.metrics_text.insert(tk.END, metrics.format_table())
+        self.after(1000, self.refresh_metrics_panel)
+
+    def export_metrics(self, kind):
+        path = filedialog.asksaveasfilename(parent=self.metrics_panel, defaultextension=f".{kind}",
+                                            filetypes=[("JSON", "*.json")] if kind == 'json' else [("Prometheus text", "*.prom")])
+        if not path:
+            return
+        with open(path, 'w') as f:
+            f.write(metrics.to_json() if kind == 'json' else metrics.to_prometheus())
+
     def dim_screens(self):
         # Create an overlay that dims all windows except the selected capture area
         self.capture_overlay = tk.Toplevel(self)
@@ -100,11 +282,18 @@ class ScreenCaptureUI(tk.Tk, MouseEventsMixin):
         self.capture_overlay.bind("<ButtonRelease-1>", self.mouse_up)
 
         # Update the label to show which screen is active
-        x, y = self.mouse_tracker.get_position()
+        x, y = self.winfo_pointerxy()
         self.active_monitor = self.sc.get_monitor_from_position(x, y)["id"]
         self.screen_label.config(text=f"Screen: {self.active_monitor}")
 
 
+    def on_close(self):
+        self.stop_capture()
+        if self.engine is not None:
+            self.engine.stop()
+        self.destroy()
+
+
 if __name__ == "__main__":
     app = ScreenCaptureUI()
     app.mainloop()
@@ -1,24 +1,28 @@
-import pyautogui
-import threading
-import time
+# Shortest time between two refreshes of the coordinates label, in milliseconds
+label_refresh_ms = 30
 
 
 class MouseTracker:
-    def __init__(self, ui):
-        self.ui = ui
-        self.position = (0, 0)
-        self.track_mouse()
+    """Follow the pointer through Tk <Motion> events instead of polling it.
 
-    def track_mouse(self):
-        def update():
-            while True:
-                x, y = pyautogui.position()
-                self.position = (x, y)
-                self.ui.mouse_coords_label.config(text=f"Mouse Coordinates: ({x}, {y})")
-                time.sleep(0.1)  # Update every 100ms
+    Motion events record the pointer position; the coordinates label is refreshed
+    at most once per label_refresh_ms with the newest one. Nothing runs while the
+    pointer is still. Only positions over the application's windows are seen.
+    """
+    def __init__(self, ui, refresh_ms=label_refresh_ms):
+        self.ui = ui
+        self.refresh_ms = refresh_ms
+        self.position = (0, 0)  # Newest pointer position; events and refreshes both run on the Tk thread
+        self.refresh_pending = None  # Id of the scheduled label refresh
+        ui.bind_all('<Motion>', self.on_motion, add='+')
 
-        thread = threading.Thread(target=update, daemon=True)
-        thread.start()
+    def on_motion(self, event):
+        self.position = (event.x_root, event.y_root)
+        # Coalesce a burst of motion events into one label update
+        if self.refresh_pending is None:
+            self.refresh_pending = self.ui.after(self.refresh_ms, self.refresh)
 
-    def get_position(self):
-        return self.position
+    def refresh(self):
+        self.refresh_pending = None
+        x, y = self.position
+        self.ui.mouse_coords_label.config(text=f"Mouse Coordinates: ({x}, {y})")